@@ -3,8 +3,22 @@ A combination of previous projects...
 A text-based dungeon crawler in which hte player navigates a maze and must defeat enemies to progress
 """
 
-import dungeon_classes as dc
-import dungeon_functions as dfunc
+import os
+
+import dungeon_engine as dengine
+import dungeon_lazy as dlazy
+import dungeon_metrics as dmetrics
+import dungeon_render as drender
+import dungeon_replay as dreplay
+
+# Only needed for a multi-level dungeon or wandering enemies, and they import NumPy, which the game otherwise loads
+# in the background
+dlevels = dlazy.LazyModule('dungeon_levels')
+dwander = dlazy.LazyModule('dungeon_wander')
+
+EXPLORE_PROMPT = 'Do you wish to [M]ove, [L]ook around room, [C]heck map, Check [h]ealth, [R]est, or E[x]it? '
+LEVELS_EXPLORE_PROMPT = 'Do you wish to [M]ove, [L]ook around room, [C]heck map, Check [h]ealth, [R]est, ' \
+                        'go [U]p the stairs, or E[x]it? '
 
 
 def print_header():
@@ -16,22 +30,15 @@ def print_header():
     print()
 
 
-def initialize():
+def initialize(engine_class=dengine.GameEngine, **options):
     """
     Creates all required objects for game function
-    :return: maze_choice, maze_layout, d20, d8, enemies, player
+    :param engine_class: GameEngine or a subclass, e.g. dungeon_replay.RecordingEngine to record the session or
+                         dungeon_levels.DungeonEngine for a multi-level dungeon, or dungeon_wander.WanderingEngine
+                         for enemies that move every turn
+    :param options: Extra new_game arguments, e.g. maze_path
+    :return: GameEngine holding the maze, dice, enemies, and player
     """
-    # initialize_combatants
-    d6 = dc.Die(6)
-    d8 = dc.Die(8)
-    d20 = dc.Die(20)
-
-    enemies = [
-        dc.Combatant('Heathcliffe', d6.stats_rolls()),
-        dc.Combatant('Oberon', d6.stats_rolls()),
-        dc.Combatant('Death Gun', d6.stats_rolls()),
-    ]
-
     # verify player name input
     player_name = ''
     while not player_name:
@@ -40,141 +47,128 @@ def initialize():
 
         if not player_name:
             print('Input not recognized. Please re-enter a name.\n')
-    player = dc.Player(player_name, d6.stats_rolls())
+    engine = engine_class.new_game(player_name, **options)
 
     print('A heroic adventurer wanders into a maze...')
-    print(player)
-
-    # Create mazes
-    maze_choice, maze_layout = dfunc.maze_initialization()
-    enemy_locations = spawn_enemies(enemies, maze_choice)
+    print(engine.player)
 
-    return maze_choice, maze_layout, d20, d8, enemies, enemy_locations, player
+    return engine
 
 
-def spawn_enemies(enemies, maze_choice):
+def read_direction():
     """
-    Chooses enemies in order to spawn at preset locations for each map
-    :param enemies: A list of enemies in the field
-    :param maze_choice: int index of which maze was chosen
-    :return: N/A
+    Asks for a direction until one is entered
+    :return: Lowercase direction string
     """
-    spawn_rooms = [[], [], []]
-    if maze_choice == 0:
-        spawn_rooms[0] = [3, 1]  # x, y
-        spawn_rooms[1] = [2, 3]  # x, y
-        spawn_rooms[2] = [5, 6]  # x, y
-    elif maze_choice == 1:
-        spawn_rooms[0] = [4, 3]  # x, y
-        spawn_rooms[1] = [7, 6]  # x, y
-        spawn_rooms[2] = [7, 1]  # x, y
-    elif maze_choice == 2:
-        spawn_rooms[0] = [2, 1]  # x, y
-        spawn_rooms[1] = [5, 3]  # x, y
-        spawn_rooms[2] = [0, 2]  # x, y
+    print('Where would you like to move?')
+
+    direction = ''
+    while not direction:
+        direction = input('[N]orth, [E]ast, [S]outh, [W]est: ')
 
-    enemies[0].x_location = spawn_rooms[0][0]
-    enemies[0].y_location = spawn_rooms[0][1]
+        if not direction:
+            print("No input detected, please re-enter a direction\n")
 
-    enemies[1].x_location = spawn_rooms[1][0]
-    enemies[1].y_location = spawn_rooms[1][1]
+    return direction.lower().strip()
 
-    enemies[2].x_location = spawn_rooms[2][0]
-    enemies[2].y_location = spawn_rooms[2][1]
 
-    return spawn_rooms
+def show(events, renderer, enemies=()):
+    """
+    Prints the UI output for a list of engine events
+    :param events: List of Events from GameEngine.step
+    :param renderer: MazeRenderer used to draw the map around the player
+    :param enemies: Combatant objects marked on the map (the renderer's ExploredMap hides the unseen ones)
+    :return: UI output
+    """
+    for event in events:
+        print(dengine.describe(event))
+        if event.kind == 'map':
+            x, y = event.value[:2]
+            print('\n'.join(renderer.render(x, y, enemies)))
+            print()
 
 
-def game_loop(maze_choice, maze_layout, d20, d8, enemies, enemy_locations, player):
+def game_loop(engine):
     """
-    Executes the main game loop
-    :param maze_choice: int index of which maze was chosen
-    :param maze_layout: list describing the layout of the maze rooms
-    :param player: Player object with inputted name
-    :param d20: A 20 sided Die object
-    :param d8: An 8 sided Die object
-    :param enemies: A list of enemies in the field
+    Executes the main game loop as a command line frontend over the GameEngine
+    :param engine: GameEngine holding the maze, dice, enemies, and player
     :return: N/A
     """
-    while True:
-
-        # Check for undefeated enemy in room
-        player_location = [player.x_location, player.y_location]
-        if player_location == enemy_locations[0]:
-            fighter = enemies[0]
-            if fighter.defeated:
-                pass
-            else:
-                print(f'{player.name} spots an enemy in the room and charges at {fighter.name}!')
-                dfunc.fight_loop(d20, d8, enemies, player, fighter, last_location)
-        elif player_location == enemy_locations[1]:
-            fighter = enemies[1]
-            if fighter.defeated:
-                pass
-            else:
-                print(f'{player.name} spots an enemy in the room and charges at {fighter.name}!')
-                dfunc.fight_loop(d20, d8, enemies, player, fighter, last_location)
-        elif player_location == enemy_locations[2]:
-            fighter = enemies[2]
-            if fighter.defeated:
-                pass
-            else:
-                print(f'{player.name} spots an enemy in the room and charges at {fighter.name}!')
-                dfunc.fight_loop(d20, d8, enemies, player, fighter, last_location)
-
-        cmd = input('Do you wish to [M]ove, [L]ook around room, [C]heck map, Check [h]ealth, [R]est, or E[x]it? ')
+    explore_prompt = LEVELS_EXPLORE_PROMPT if hasattr(engine, 'levels') else EXPLORE_PROMPT  # a DungeonEngine
+    renderer = None
+    while engine.mode != dengine.OVER:
+        # A DungeonEngine swaps mazes as the player takes the stairs
+        if renderer is None or renderer.maze is not engine.maze:
+            renderer = drender.MazeRenderer(engine.maze, explored=engine.explored)
+
+        if engine.mode == dengine.FIGHT:
+            cmd = input('What would you like to do? [A]ttack, [R]un away: ')
+        else:
+            cmd = input(explore_prompt)
         if not cmd:
             print("No input detected, please re-enter a command\n")
             continue
 
         cmd = cmd.lower().strip()
 
-        if cmd == 'm':
-            move = 0
-            # Record last location
-            last_location = [player.y_location, player.x_location]
-
-            while not move:
-                move = dfunc.move_loop(maze_layout, move, player)
-
-        elif cmd == 'l':
-            player.look_room(maze_layout[player.y_location][player.x_location])
-            print()
-
-        elif cmd == 'c':
-            player.check_map(maze_choice)
-            print()
-
-        elif cmd == 'h':
-            print(f'{player.name} currently has {player.HP}/{player.MaxHP}HP.\n')
-
-        elif cmd == 'r':
-            dfunc.rest(d8, player, enemies)
-
-        elif cmd == 'x':
-            print('Thanks for playing!')
-            break
+        if engine.mode == dengine.EXPLORE and cmd == 'm':
+            events = []
+            while not events or events[0].kind != 'moved':
+                events = engine.step(cmd, read_direction())
+                show(events, renderer, engine.enemies)
 
         else:
-            print(f"I'm sorry, {cmd} was not recognized. Please re-enter a command.\n")
-
-        # Set and check end of game conditions
-        x_finish = 6 if maze_choice == 0 else 7 if maze_choice == 1 else 0
-        y_finish = 6 if maze_choice == 0 else 0 if maze_choice == 1 else 1
-        enemies_defeated = [enemies[0].defeated, enemies[1].defeated, enemies[2].defeated]
-
-        if player.x_location == x_finish and player.y_location == y_finish and all(enemies_defeated):
-            print(f'{player.name} has made it to the end of the maze and defeated all enemies! Congratulations!!')
-            print("'Thanks for playing!")
-            break
-        elif player.x_location == x_finish and player.y_location == y_finish and not all(enemies_defeated):
-            print(f"{player.name} has made it to the end of the maze... but enemies remain and the exit won't open...")
+            if engine.mode == dengine.FIGHT and cmd == 'a':
+                print('Rolling some dice...\n')
+            show(engine.step(cmd), renderer, engine.enemies)
 
 
 def main():
-    print_header()
-    maze_choice, maze_layout, d20, d8, enemies, enemy_locations, player = initialize()
-    game_loop(maze_choice, maze_layout, d20, d8, enemies, enemy_locations, player)
+    # e.g. DUNGEON_METRICS=session.json records counters and timings of this session (.csv for CSV)
+    metrics_path = os.environ.get('DUNGEON_METRICS')
+    if metrics_path:
+        dmetrics.enable()
+
+    # e.g. DUNGEON_REPLAY=session.bvdr records the seed and commands so the session can be replayed exactly
+    replay_path = os.environ.get('DUNGEON_REPLAY')
+
+    # e.g. DUNGEON_MAZE=huge.maze plays a maze file written by dungeon_mazefile, loading only the tiles reached
+    options = {}
+    if os.environ.get('DUNGEON_MAZE'):
+        options['maze_path'] = os.environ['DUNGEON_MAZE']
+
+    # e.g. DUNGEON_LEVELS=1 descends through random levels instead of ending at the first exit
+    levels = bool(os.environ.get('DUNGEON_LEVELS'))
+    if levels and (replay_path or options):
+        raise SystemExit('DUNGEON_LEVELS cannot be combined with DUNGEON_REPLAY or DUNGEON_MAZE.')
+
+    # e.g. DUNGEON_WANDER=1 moves every undefeated enemy one room after each turn the player spends exploring
+    wander = bool(os.environ.get('DUNGEON_WANDER'))
+    if wander and (replay_path or options or levels):
+        raise SystemExit('DUNGEON_WANDER cannot be combined with DUNGEON_REPLAY, DUNGEON_MAZE, or DUNGEON_LEVELS.')
+
+    # NumPy is only needed once the game starts, so it loads while the player types their name
+    dlazy.preload('numpy')
+
+    engine = None
+    try:
+        print_header()
+        engine_class = dengine.GameEngine
+        if replay_path:
+            engine_class = dreplay.RecordingEngine
+        elif levels:
+            engine_class = dlevels.DungeonEngine
+        elif wander:
+            engine_class = dwander.WanderingEngine
+        engine = initialize(engine_class, **options)
+        game_loop(engine)
+    finally:
+        if metrics_path:
+            dmetrics.disable().write(metrics_path)
+        if engine is not None:
+            if replay_path:
+                engine.save_log(replay_path)
+            engine.close()
 
 
 if __name__ == '__main__':
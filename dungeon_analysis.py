@@ -0,0 +1,231 @@
+"""
+Batch maze checks for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+Analyzes a whole stack of same-sized mazes at once with NumPy, so layouts from random_maze can be checked and
+filtered as fast as they are generated
+MazeReport: per-maze door mismatches, boundary leaks, reachability from the start and of the exit, dead ends,
+junctions, and loops
+analyze_masks / analyze_mazes: MazeReport of a (count, height, width) stack of door masks or room codes
+analyze_maze: MazeReport of one MazeGrid, as plain numbers
+valid: which mazes of a MazeReport have matching doors, no leaks, and a reachable exit
+random_valid_mazes: random_maze layouts that pass valid, for filtering bad layouts at generation time
+Moves follow Player.move (a door on the current room leading inside the maze), so reachability is directed when
+doors don't match; dead ends, junctions, and loops count passages, i.e. doors matched on both sides.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+import dungeon_classes as dc
+import dungeon_functions as dfunc
+import dungeon_grid as dg
+
+
+# door_mismatches: neighbouring room pairs where only one side has a door between them
+# boundary_leaks: doors leading out of the maze
+# reachable: rooms reachable from the start (0, 0)
+# exit_reachable: True if the exit can be reached from the start
+# reach_exit: rooms the exit can be reached from
+# dead_ends / junctions: rooms with exactly one / three or more passages
+# loops: independent cycles of passages (passages - rooms + connected regions)
+# finish: (x, y) of the exit analyzed
+MazeReport = namedtuple('MazeReport', ['door_mismatches', 'boundary_leaks', 'reachable', 'exit_reachable',
+                                       'reach_exit', 'dead_ends', 'junctions', 'loops', 'finish'])
+
+_UNSEEN = -1
+
+
+def _moves(masks):
+    """
+    :param masks: (count, height, width) door masks
+    :return: List of (allowed, offset) per direction: flat bool array of the rooms that move can be made from,
+             and the flat index offset it moves by (never crossing between mazes, as the edges are closed)
+    """
+    width = masks.shape[2]
+    moves = []
+    for bit, (x_step, y_step) in zip((dc.NORTH, dc.EAST, dc.SOUTH, dc.WEST), dc.STEPS.values()):
+        allowed = (masks & bit) > 0
+        if y_step:
+            allowed[:, 0 if y_step < 0 else -1, :] = False
+        if x_step:
+            allowed[:, :, 0 if x_step < 0 else -1] = False
+        moves.append((allowed.ravel(), y_step * width + x_step))
+    return moves
+
+
+def _search(moves, starts, size, reverse=False):
+    """
+    Breadth first search of every maze at once, one whole frontier at a time (as MazePaths does for one maze)
+    :param moves: _moves of the stack
+    :param starts: Flat index of each maze's starting room
+    :param size: Number of rooms in the stack
+    :param reverse: Search the rooms that can reach the starts instead of the rooms reached from them
+    :return: Flat int32 distances, _UNSEEN where a room isn't reached
+    """
+    field = np.full(size, _UNSEEN, dtype=np.int32)
+    owner = np.empty(size, dtype=np.intp)
+    frontier = np.asarray(starts, dtype=np.intp)
+    field[frontier] = 0
+    distance = 0
+    while frontier.size:
+        distance += 1
+        found = []
+        for allowed, offset in moves:
+            if reverse:
+                rooms = frontier - offset
+                rooms = rooms[(rooms >= 0) & (rooms < size)]
+                rooms = rooms[allowed[rooms]]
+            else:
+                rooms = frontier[allowed[frontier]] + offset
+            found.append(rooms[field[rooms] == _UNSEEN])
+        found = np.concatenate(found)
+        # Keep one copy of each room: the last write to owner wins, without sorting like np.unique would
+        owner[found] = np.arange(found.size)
+        frontier = found[owner[found] == np.arange(found.size)]
+        field[frontier] = distance
+    return field
+
+
+def _region_count(east, south):
+    """
+    Counts connected regions of passages in every maze at once: rooms joined east-west along a row are one run,
+    then runs joined by south passages are merged by hooking and pointer jumping like MazePaths.components
+    :param east: (count, height, width - 1) bool passages between each room and the one east of it
+    :param south: (count, height - 1, width) bool passages between each room and the one south of it
+    :return: int array of regions per maze (a room without passages is a region of its own)
+    """
+    count, height, width = east.shape[0], south.shape[1] + 1, east.shape[2] + 1
+    run_starts = np.ones((count, height, width), dtype=bool)
+    run_starts[:, :, 1:] = ~east
+    runs = np.cumsum(run_starts.ravel(), dtype=np.int32) - 1  # run number of every room
+    first_runs = runs[::height * width]  # first run of each maze
+
+    rooms = runs.reshape(count, height, width)
+    starts, ends = rooms[:, :-1, :][south], rooms[:, 1:, :][south]
+    labels = np.arange(runs[-1] + 1, dtype=np.int32)
+    while starts.size:
+        start_labels, end_labels = labels[starts], labels[ends]
+        joined = start_labels != end_labels
+        if not joined.any():
+            break
+        # Runs already merged stay merged, so only the edges still joining two labels are checked again
+        starts, ends = starts[joined], ends[joined]
+        start_labels, end_labels = start_labels[joined], end_labels[joined]
+        np.minimum.at(labels, np.maximum(start_labels, end_labels), np.minimum(start_labels, end_labels))
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+    # A region's label is its smallest run, so each region has exactly one run labelled with itself
+    return np.add.reduceat((labels == np.arange(labels.size)).astype(np.intp), first_runs)
+
+
+def analyze_masks(masks, finishes=None):
+    """
+    Checks a stack of same-sized mazes
+    :param masks: (count, height, width) array of door masks (North=1, East=2, South=4, West=8)
+    :param finishes: (count, 2) x, y of each maze's exit, or None to use the room farthest from the start (as
+                     dungeon_levels.generate_level places the exit)
+    :return: MazeReport of (count,) arrays, finish as a (count, 2) array
+    """
+    masks = np.asarray(masks, dtype=np.uint8)
+    count, height, width = masks.shape
+    area = height * width
+
+    # Doors between neighbours, as seen from each side
+    east_doors, west_doors = (masks[:, :, :-1] & dc.EAST) > 0, (masks[:, :, 1:] & dc.WEST) > 0
+    south_doors, north_doors = (masks[:, :-1, :] & dc.SOUTH) > 0, (masks[:, 1:, :] & dc.NORTH) > 0
+    mismatches = np.count_nonzero(east_doors != west_doors, axis=(1, 2)) + \
+        np.count_nonzero(south_doors != north_doors, axis=(1, 2))
+    leaks = np.count_nonzero(masks[:, 0, :] & dc.NORTH, axis=1) + \
+        np.count_nonzero(masks[:, -1, :] & dc.SOUTH, axis=1) + \
+        np.count_nonzero(masks[:, :, 0] & dc.WEST, axis=1) + np.count_nonzero(masks[:, :, -1] & dc.EAST, axis=1)
+
+    # Passages per room
+    east, south = east_doors & west_doors, south_doors & north_doors
+    passages = np.zeros(masks.shape, dtype=np.uint8)
+    passages[:, :, :-1] += east
+    passages[:, :, 1:] += east
+    passages[:, :-1, :] += south
+    passages[:, 1:, :] += south
+    passage_count = np.count_nonzero(east, axis=(1, 2)) + np.count_nonzero(south, axis=(1, 2))
+    loops = passage_count - area + _region_count(east, south)
+
+    # Reachability from every start (0, 0), then of every exit
+    moves = _moves(masks)
+    first_rooms = np.arange(count) * area
+    from_start = _search(moves, first_rooms, count * area).reshape(count, area)
+    if finishes is None:
+        exits = np.argmax(from_start, axis=1)
+        finishes = np.stack([exits % width, exits // width], axis=1)
+    else:
+        finishes = np.asarray(finishes, dtype=np.intp).reshape(count, 2)
+        exits = finishes[:, 1] * width + finishes[:, 0]
+    to_exit = _search(moves, first_rooms + exits, count * area, reverse=True).reshape(count, area)
+
+    return MazeReport(mismatches, leaks, np.count_nonzero(from_start != _UNSEEN, axis=1), to_exit[:, 0] != _UNSEEN,
+                      np.count_nonzero(to_exit != _UNSEEN, axis=1), np.count_nonzero(passages == 1, axis=(1, 2)),
+                      np.count_nonzero(passages >= 3, axis=(1, 2)), loops, finishes)
+
+
+def analyze_mazes(mazes, finishes=None):
+    """
+    Checks a stack of same-sized mazes in index format, e.g. random_maze(size, as_array=True) outputs
+    :param mazes: (count, height, width) array of room codes
+    :param finishes: As in analyze_masks
+    :return: MazeReport of (count,) arrays
+    """
+    # Indexing with the codes as they are (uint8 for random_maze arrays) avoids an 8 byte per room intp copy
+    return analyze_masks(dg.ROOM_MASKS[np.asarray(mazes)], finishes)
+
+
+def analyze_maze(maze):
+    """
+    Checks one maze
+    :param maze: MazeGrid (its finish is used when set)
+    :return: MazeReport of ints and bools, finish as an (x, y) tuple
+    """
+    report = analyze_masks(maze.masks[None], None if maze.finish is None else [maze.finish])
+    return MazeReport(*(field[0].item() for field in report[:-1]), tuple(report.finish[0].tolist()))
+
+
+def valid(report, area, min_reachable=0.0):
+    """
+    :param report: MazeReport from analyze_masks or analyze_mazes
+    :param area: Rooms per maze
+    :param min_reachable: Fraction of the rooms that must be reachable from the start (random_maze layouts
+                          nearly always have some closed-off rooms, so 1.0 rejects most of them)
+    :return: bool array, True for mazes with matching doors, no leaks, an exit reachable from the start, and at
+             least min_reachable of their rooms reachable
+    """
+    return (report.door_mismatches == 0) & (report.boundary_leaks == 0) & report.exit_reachable & \
+        (report.reachable >= min_reachable * area)
+
+
+def random_valid_mazes(count, size, seed=None, min_reachable=0.0, batch=256, max_batches=1000):
+    """
+    Generates random_maze layouts in batches and keeps the ones that pass valid
+    :param count: Number of mazes wanted
+    :param size: Square dimension of each maze
+    :param seed: Seed or numpy Generator for reproducible mazes
+    :param min_reachable: As in valid
+    :param batch: Number of mazes generated and checked at a time
+    :param max_batches: Number of batches to try before giving up, as strict settings may never be met
+    :return: (count, size, size) uint8 room codes, (count, 2) x, y of each maze's exit, and the number of mazes
+             generated to find them
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    kept, exits, found, generated = [], [], 0, 0
+    while found < count:
+        if generated >= max_batches * batch:
+            raise ValueError(f'Only {found} of {count} mazes passed valid in {generated} random {size}x{size} mazes; '
+                             f'lower min_reachable or raise max_batches.')
+        mazes = np.stack([dfunc.random_maze(size, rng, as_array=True) for _ in range(batch)])
+        report = analyze_mazes(mazes)
+        good = valid(report, size * size, min_reachable)
+        kept.append(mazes[good])
+        exits.append(report.finish[good])
+        found += int(np.count_nonzero(good))
+        generated += batch
+    return np.concatenate(kept)[:count], np.concatenate(exits)[:count], generated
@@ -0,0 +1,242 @@
+"""
+Automated play for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+AutoPlayer: policy that rests when hurt, walks shortest paths to the nearest enemy, fights, runs away when
+close to death, and heads for the exit once every enemy is defeated
+play_game: plays one GameEngine to the end with a policy, counting what happened
+play_games: plays many complete games headlessly (optionally on several cores) and collects the counts
+AutoplayResults: per-game counts as arrays, with aggregate statistics
+main: command line entry point, e.g. python dungeon_autoplay.py --games 100000
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import dungeon_classes as dc
+import dungeon_engine as de
+import dungeon_paths as dpaths
+
+
+# Per-game values recorded by play_game, in order
+FIELDS = ('won', 'turns', 'moves', 'wall_bumps', 'fights', 'attacks', 'runs', 'escapes', 'deaths', 'rests',
+          'enemies_defeated', 'maze')
+
+_DIRECTIONS = {-1: None, 0: 'n', 1: 'e', 2: 's', 3: 'w'}
+
+# Event kind -> index in FIELDS of the count it adds to
+_COUNTED_EVENTS = {'moved': 2, 'wall': 3, 'encounter': 4, 'ambush': 4, 'attack': 5, 'escape': 7,
+                   'player_defeated': 8, 'rest': 9, 'enemy_defeated': 10}
+
+
+class AutoPlayer:
+
+    def __init__(self, rest_below=0.5, run_below=0.25):
+        """
+        :param rest_below: Rest before moving on while HP is below this fraction of MaxHP
+        :param run_below: Run from a fight while HP is at or below this fraction of MaxHP
+        """
+        self.rest_below = rest_below
+        self.run_below = run_below
+        self._routes = {}  # built-in maze number -> {target: route}, shared by every game on that maze
+        self._random_maze = None  # random maze the routes under None belong to
+        self._plan = None  # (engine, room the last move leads to, route being followed)
+
+    def __str__(self):
+        return f"Autoplayer resting below {self.rest_below:.0%} HP and running at {self.run_below:.0%} HP."
+
+    def route(self, engine, target):
+        """
+        Distances and first moves towards a target from every room, computed once per maze and target
+        :param engine: GameEngine being played
+        :param target: (x, y) of the target room
+        :return: (list of distances, list of 'n'/'e'/'s'/'w' or None), both indexed by y * width + x
+        """
+        maze = engine.maze
+        if engine.maze_choice is None and maze is not self._random_maze:
+            self._random_maze = maze
+            self._routes[None] = {}
+        routes = self._routes.setdefault(engine.maze_choice, {})
+        route = routes.get(target)
+        if route is None:
+            paths = dpaths.paths_for(maze) if engine.maze_choice is None else dpaths.MazePaths(maze, 1)
+            directions = paths.directions_to(*target).ravel().tolist()
+            route = routes[target] = (paths.distances_to(*target).ravel().tolist(),
+                                      [_DIRECTIONS[direction] for direction in directions])
+        return route
+
+    def target(self, engine):
+        """
+        Room to head for: the nearest undefeated enemy, or the exit once they are all defeated
+        :param engine: GameEngine being played
+        :return: Route from route() to the target, or None if no target can be reached
+        """
+        player = engine.player
+        room = player.y_location * engine.maze.width + player.x_location
+        best, best_distance = None, None
+        for enemy in engine.enemies:
+            if not enemy.defeated:
+                route = self.route(engine, (enemy.x_location, enemy.y_location))
+                distance = route[0][room]
+                if distance != dpaths.UNREACHABLE and (best is None or distance < best_distance):
+                    best, best_distance = route, distance
+        if best is None and all(enemy.defeated for enemy in engine.enemies):
+            route = self.route(engine, engine.maze.finish)
+            if route[0][room] != dpaths.UNREACHABLE:
+                best = route
+        return best
+
+    def choose(self, engine):
+        """
+        Picks the next command
+        :param engine: GameEngine being played
+        :return: (command, direction) for GameEngine.step; ('x', None) when the game can't be finished
+        """
+        player = engine.player
+        if engine.mode == de.FIGHT:
+            self._plan = None  # the fight moves the player or defeats the target, so pick a new one after it
+            if player.HP <= self.run_below * player.MaxHP:
+                return 'r', None
+            return 'a', None
+
+        if player.HP < self.rest_below * player.MaxHP:
+            return 'r', None
+
+        # Keep following the same route while the player is where the last move led
+        width = engine.maze.width
+        room = player.y_location * width + player.x_location
+        plan = self._plan
+        if plan is not None and plan[0] is engine and plan[1] == room:
+            route = plan[2]
+        else:
+            route = self.target(engine)
+            if route is None:
+                return 'x', None
+
+        direction = route[1][room]
+        if direction is None:
+            # Already in the enemy's room (e.g. a second enemy there): looking around starts the fight
+            self._plan = None
+            return 'l', None
+        x_step, y_step = dc.STEPS[direction]
+        self._plan = (engine, room + y_step * width + x_step, route)
+        return 'm', direction
+
+
+def play_game(engine, agent, max_turns=10_000):
+    """
+    Plays a game until it is won, the agent quits, or max_turns commands have been given
+    :param engine: GameEngine at the start of a game
+    :param agent: Object with a choose(engine) method returning (command, direction), e.g. AutoPlayer
+    :param max_turns: Turns after which the game is abandoned
+    :return: List of counts named by FIELDS (won is 1 for a victory)
+    """
+    counts = [0] * len(FIELDS)
+    step = engine.step
+    turn = -1  # no turns played if max_turns is 0
+    for turn in range(max_turns):
+        command, direction = agent.choose(engine)
+        if engine.mode == de.FIGHT and command == 'r':
+            counts[6] += 1
+        for event in step(command, direction):
+            index = _COUNTED_EVENTS.get(event.kind)
+            if index is not None:
+                counts[index] += 1
+            elif event.kind == 'victory':
+                counts[0] = 1
+        if engine.mode == de.OVER:
+            break
+    counts[1] = turn + 1
+    counts[11] = -1 if engine.maze_choice is None else engine.maze_choice
+    return counts
+
+
+class AutoplayResults:
+
+    def __init__(self, counts):
+        self.counts = counts  # (games, len(FIELDS)) int64 array
+        for index, name in enumerate(FIELDS):
+            setattr(self, name, counts[:, index])  # one array per field, e.g. results.turns
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __str__(self):
+        return f"{len(self)} games, {self.won.mean():.1%} won, {self.turns.mean():.1f} turns on average."
+
+    def summary(self):
+        """
+        Aggregate statistics of every field
+        :return: Dictionary of field -> {'mean', 'std', 'min', 'median', 'max'}, plus 'games' and 'by_maze'
+                 (the same for each maze number, -1 for random mazes)
+        """
+        def describe(counts):
+            return {name: {'mean': float(column.mean()), 'std': float(column.std()), 'min': int(column.min()),
+                           'median': float(np.median(column)), 'max': int(column.max())}
+                    for name, column in zip(FIELDS[:-1], counts[:, :-1].T)}
+
+        return {'games': len(self),
+                **describe(self.counts),
+                'by_maze': {int(maze): describe(self.counts[self.maze == maze]) for maze in np.unique(self.maze)}}
+
+
+def _play_chunk(first_game, games, seed, maze_size, enemy_count, rest_below, run_below, max_turns):
+    """
+    Plays a range of games (runs inside a worker process)
+    :return: (games, len(FIELDS)) int64 array
+    """
+    agent = AutoPlayer(rest_below, run_below)
+    # One dice stream per chunk: a new DicePool for every game would draw a fresh block of each die size
+    pool = dc.DicePool(np.random.SeedSequence([seed, first_game]))
+    counts = np.empty((games, len(FIELDS)), dtype=np.int64)
+    for game in range(games):
+        engine = de.GameEngine.new_game('Kirito', enemy_count=enemy_count, maze_size=maze_size, pool=pool)
+        counts[game] = play_game(engine, agent, max_turns)
+    return counts
+
+
+def play_games(games=100_000, seed=0, maze_size=None, enemy_count=3, rest_below=0.5, run_below=0.25,
+               max_turns=10_000, workers=1, chunk_games=10_000):
+    """
+    Plays many complete games with AutoPlayer; each chunk of games rolls from its own stream seeded with
+    [seed, first game of the chunk], so results depend on seed and chunk_games but not on workers
+    :param games: Number of games
+    :param seed: Integer seed for the whole batch
+    :param maze_size: Side of a random_maze for every game, None for the built-in mazes
+    :param enemy_count: Number of enemies per game
+    :param rest_below: AutoPlayer rests while HP is below this fraction of MaxHP
+    :param run_below: AutoPlayer runs from fights at or below this fraction of MaxHP
+    :param max_turns: Turns after which a game is abandoned
+    :param workers: Number of worker processes (1 plays in this process, None uses all cores)
+    :param chunk_games: Games per worker task
+    :return: AutoplayResults
+    """
+    chunks = [(start, min(chunk_games, games - start)) for start in range(0, games, chunk_games)]
+    settings = (seed, maze_size, enemy_count, rest_below, run_below, max_turns)
+    if workers == 1 or len(chunks) <= 1:
+        results = [_play_chunk(start, count, *settings) for start, count in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_play_chunk, *zip(*[(start, count) + settings for start, count in chunks])))
+    return AutoplayResults(np.concatenate(results) if results else np.empty((0, len(FIELDS)), dtype=np.int64))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Plays many games automatically and reports statistics.')
+    parser.add_argument('--games', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--maze-size', type=int, help='play random mazes of this size instead of the built-in ones')
+    parser.add_argument('--enemies', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=1, help='worker processes (0 for all cores)')
+    args = parser.parse_args(argv)
+
+    results = play_games(args.games, args.seed, args.maze_size, args.enemies, workers=args.workers or None)
+    print(results)
+    for maze, stats in results.summary()['by_maze'].items():
+        print(f"\n{'Random mazes' if maze < 0 else f'Maze #{maze + 1}'}:")
+        for name, values in stats.items():
+            print(f"  {name:17} mean {values['mean']:8.2f}  median {values['median']:7.1f}  max {values['max']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+Benchmarks for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+Times the hot paths of the game (maze generation and checking, index_to_rooms, drawing and redrawing, movement,
+enemy wandering, and combat) over a range of maze sizes and fight counts, with their UI output sent to os.devnull,
+and the game's startup in a fresh interpreter
+run_benchmarks: times every case and returns a JSON-ready dictionary of results
+compare: checks results against a stored baseline and lists the cases that got slower
+main: command line entry point, e.g.
+    python dungeon_bench.py --save-baseline          (record bench_baseline.json on this machine)
+    python dungeon_bench.py --output bench.json      (time again, compare, exit with status 1 on a regression)
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import dungeon_analysis as danalysis
+import dungeon_classes as dc
+import dungeon_engine as de
+import dungeon_functions as dfunc
+import dungeon_grid as dg
+import dungeon_render as drender
+import dungeon_simulation as ds
+import dungeon_wander as dwander
+
+
+RESULTS_VERSION = 1
+MAZE_SIZES = (16, 128, 512)
+FIGHT_COUNTS = (10, 100, 1000)
+MOVES = 1000
+MAZE_BATCH = 1000
+WANDER_MAZE = 1024
+
+# Startup cases: code run by a fresh interpreter, up to the name prompt ('import') or a playable game ('new_game')
+STARTUP = {'import': 'import bv_dungeon_game',
+           'new_game': 'import bv_dungeon_game; bv_dungeon_game.dengine.GameEngine.new_game("Kirito")'}
+
+
+# Each case builds its inputs once and returns the function to time
+def _random_maze(size):
+    return lambda: dfunc.random_maze(size, seed=0)
+
+
+def _analyze_mazes(size):
+    rng = np.random.default_rng(0)
+    mazes = np.stack([dfunc.random_maze(size, rng, as_array=True) for _ in range(MAZE_BATCH)])
+    return lambda: danalysis.analyze_mazes(mazes)
+
+
+def _index_to_rooms(size):
+    maze = dfunc.random_maze(size, seed=0)
+    # index_to_rooms replaces the indexes in place, so every call converts a fresh copy
+    return lambda: dfunc.index_to_rooms([row[:] for row in maze], dg.ROOMS)
+
+
+def _vizualize_maze(size):
+    maze = dfunc.random_maze(size, seed=0)
+    return lambda: dfunc.vizualize_maze(maze)
+
+
+def _render(size):
+    renderer = drender.MazeRenderer(dg.MazeGrid.from_indexes(dfunc.random_maze(size, seed=0)))
+
+    def render():
+        renderer._encoded.clear()  # time drawing from scratch rather than the row cache
+        renderer.render(size // 2, size // 2)
+    return render
+
+
+def _render_update(size):
+    renderer = drender.MazeRenderer(dg.MazeGrid.from_indexes(dfunc.random_maze(size, seed=0)))
+    rng = np.random.default_rng(0)
+    enemies = [dc.Combatant(de.enemy_name(i), [10] * 6, x, y)
+               for i, (x, y) in enumerate(rng.integers(0, size, (32, 2)).tolist())]
+    # The player walks back and forth along the middle row, so most frames only change the player's row
+    path = list(range(size)) + list(range(size - 2, 0, -1))
+    path = (path * (MOVES // len(path) + 1))[:MOVES]
+
+    def update():
+        for x in path:
+            renderer.update(x, size // 2, enemies)
+    return update
+
+
+def _player_move(size):
+    maze = dg.MazeGrid.from_indexes(dfunc.random_maze(size, seed=0))
+    directions = np.random.default_rng(0).choice(list('nesw'), MOVES).tolist()
+    player = dc.Player('Kirito', [10] * 6)
+
+    def move():
+        player.x_location = player.y_location = 0
+        for direction in directions:
+            player.move(direction, maze)
+    return move
+
+
+def _combat(fights):
+    pool = dc.DicePool(0)
+    d20, d8 = dc.Die(20, pool), dc.Die(8, pool)
+    player = dc.Player('Kirito', [12, 14, 13, 10, 10, 10])
+    enemy = dc.Combatant('Oberon', [12, 12, 12, 10, 10, 10])
+
+    def combat():
+        for _ in range(fights):
+            player.HP, enemy.HP, enemy.defeated = player.MaxHP, enemy.MaxHP, 0
+            while True:
+                dfunc.attack_target(d20, d8, enemy, player)
+                if dfunc.health_status(player, enemy, 'enemy'):
+                    break
+                dfunc.attack_target(d20, d8, player, enemy)
+                if dfunc.health_status(player, enemy, 'player'):
+                    break
+    return combat
+
+
+def _simulate_fights(fights):
+    mods, armor_class, max_hp = ds.combat_stats(np.array([[12, 14, 13, 10, 10, 10]]))
+    return lambda: ds.simulate_fights(mods, armor_class, max_hp, mods, armor_class, max_hp, fights=fights, seed=0)
+
+
+def _roll_characters(count):
+    return lambda: ds.combat_stats(ds.roll_stats(count, seed=0))
+
+
+def _engine_steps(size):
+    engine = de.GameEngine.new_game('Kirito', seed=0, maze_size=size)
+    commands = np.random.default_rng(0).choice(list('nesw'), MOVES).tolist()
+
+    def steps():
+        for direction in commands:
+            if engine.mode == de.FIGHT:
+                engine.step('a')
+            else:
+                engine.step('m', direction)
+            if engine.mode == de.OVER:
+                engine.mode = de.EXPLORE
+    return steps
+
+
+def _wander(count):
+    maze = dg.MazeGrid.from_indexes(dfunc.random_maze(WANDER_MAZE, seed=0, as_array=True))
+    rng = np.random.default_rng(0)
+    x_locations, y_locations = rng.integers(0, WANDER_MAZE, (2, count), dtype=np.int32)
+    active = np.ones(count, dtype=bool)
+    return lambda: dwander.wander(maze, x_locations, y_locations, rng, active)
+
+
+def _startup(stage):
+    command = [sys.executable, '-c', STARTUP[stage]]
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return lambda: subprocess.run(command, cwd=directory, check=True)
+
+
+# name -> (case, parameter values); results are named '<name>[<value>]'
+BENCHMARKS = {'random_maze': (_random_maze, MAZE_SIZES),
+              f'analyze_mazes x{MAZE_BATCH}': (_analyze_mazes, (16, 32)),
+              'index_to_rooms': (_index_to_rooms, MAZE_SIZES),
+              'vizualize_maze': (_vizualize_maze, MAZE_SIZES),
+              'MazeRenderer.render': (_render, MAZE_SIZES),
+              f'MazeRenderer.update x{MOVES}': (_render_update, MAZE_SIZES),
+              f'Player.move x{MOVES}': (_player_move, MAZE_SIZES),
+              f'GameEngine.step x{MOVES}': (_engine_steps, MAZE_SIZES),
+              'attack_target/health_status fights': (_combat, FIGHT_COUNTS),
+              'simulate_fights': (_simulate_fights, (1000, 100_000)),
+              'roll_stats + combat_stats': (_roll_characters, (1000, 1_000_000)),
+              f'wander tick on a {WANDER_MAZE} maze': (_wander, (1000, 100_000)),
+              'startup': (_startup, tuple(STARTUP)),
+              }
+
+
+def time_call(function, repeat=5, min_time=0.05):
+    """
+    Times a function like timeit: calls it enough times per repeat to run for min_time
+    :param function: Function without arguments
+    :param repeat: Number of timed repeats
+    :param min_time: Shortest time in seconds for one repeat
+    :return: Dictionary of best and median seconds per call, calls per repeat, and repeats
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    return {'best': min(times), 'median': statistics.median(times), 'number': number, 'repeat': repeat}
+
+
+def run_benchmarks(names=None, repeat=5, min_time=0.05, quick=False):
+    """
+    Times every benchmark case with stdout going to os.devnull
+    :param names: Benchmark names to run, or substrings of them (defaults to all)
+    :param repeat: Number of timed repeats per case
+    :param min_time: Shortest time in seconds for one repeat
+    :param quick: Only run the smallest parameter value of each benchmark
+    :return: Dictionary with machine details and 'results' of case name -> timing dictionary
+    """
+    results = {}
+    with open(os.devnull, 'w') as devnull:
+        for name, (case, values) in BENCHMARKS.items():
+            if names and not any(wanted in name for wanted in names):
+                continue
+            for value in values[:1] if quick else values:
+                with contextlib.redirect_stdout(devnull):
+                    results[f'{name}[{value}]'] = time_call(case(value), repeat, min_time)
+
+    return {'version': RESULTS_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.platform(),
+            'results': results}
+
+
+def compare(results, baseline, threshold=0.10):
+    """
+    Compares best times with a baseline from an earlier run
+    :param results: Dictionary from run_benchmarks
+    :param baseline: Dictionary from run_benchmarks (e.g. loaded from the baseline file)
+    :param threshold: Fraction a case may slow down before it counts as a regression
+    :return: List of (case name, baseline seconds, seconds, ratio) for every case in both, sorted slowest first,
+             and the list of regressed case names
+    """
+    rows = []
+    for name, timing in results['results'].items():
+        old = baseline['results'].get(name)
+        if old is not None:
+            rows.append((name, old['best'], timing['best'], timing['best'] / old['best']))
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows, [row[0] for row in rows if row[3] > 1 + threshold]
+
+
+def _format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.3g} {unit}'
+    return f'{seconds / 1e-9:.3g} ns'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Times the dungeon crawler hot paths.')
+    parser.add_argument('names', nargs='*', help='only run benchmarks whose name contains one of these')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', default='bench_baseline.json', help='baseline JSON file to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown before flagging (0.10 = 10%%)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help='only the smallest size of each benchmark')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.names, args.repeat, quick=args.quick)
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        with open(path, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        for name, timing in results['results'].items():
+            print(f'{name:50} {_format_time(timing["best"]):>10}')
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    rows, regressions = compare(results, baseline, args.threshold)
+    for name, old, new, ratio in rows:
+        flag = '  REGRESSION' if name in regressions else ''
+        print(f'{name:50} {_format_time(old):>10} -> {_format_time(new):>10} {ratio:6.2f}x{flag}')
+    if regressions:
+        print(f'{len(regressions)} of {len(rows)} benchmarks are more than {args.threshold:.0%} slower than '
+              f'{args.baseline}.')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""
+Headless game engine for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+GameEngine: owns the maze, player, enemies, and dice, and advances the game one command at a time through step()
+Event: structured record of what happened during a step (no printing, no input)
+describe: turns an Event into the UI text shown by the command line game
+enemy_name: names for any number of enemies
+"""
+
+from collections import namedtuple
+
+import dungeon_classes as dc
+import dungeon_fog as dfog
+import dungeon_functions as dfunc
+import dungeon_grid as dg
+import dungeon_lazy as dlazy
+import dungeon_paths as dpaths
+import dungeon_spatial as dspatial
+
+# Only needed to play a maze file, and it imports NumPy, which the game otherwise loads in the background
+dmazefile = dlazy.LazyModule('dungeon_mazefile')
+
+
+# Event kinds and their fields:
+# moved / wall (name=player, value=compass direction), unknown_direction / unknown_command (value=command),
+# look (target=Room), map (value=(x, y, maze number)), health (value=(HP, MaxHP)),
+# rest (target=names of enemies that rested, value=HP regained), quit, encounter (target=enemy name),
+# ambush (target=name of the enemy that wandered into the player's room, see dungeon_wander),
+# attack (name=attacker, target=defender name, value=(roll, AC, hit, damage)), status (value=(player HP, enemy HP)),
+# enemy_defeated / player_defeated (name=winner, target=loser), escape, stumble, locked, victory,
+# descend / ascend (value=new depth, see dungeon_levels), no_stairs ('u' away from a level's stairs up)
+Event = namedtuple('Event', ['kind', 'name', 'target', 'value'], defaults=(None, None))
+
+# Engine modes, which decide how step() reads a command
+EXPLORE = 'explore'
+FIGHT = 'fight'
+OVER = 'over'
+
+COMPASS = {'n': 'north', 'e': 'east', 's': 'south', 'w': 'west'}
+
+ENEMY_NAMES = ['Heathcliffe', 'Oberon', 'Death Gun']
+
+
+class GameEngine:
+
+    def __init__(self, maze, player, enemies, d20, d8, maze_choice=0):
+        self.maze = maze  # MazeGrid with the exit stored in maze.finish
+        self.player = player
+        self.enemies = enemies
+        self.d20 = d20
+        self.d8 = d8
+        self.maze_choice = maze_choice  # index of the built-in maze, None for other mazes
+        self.index = dspatial.SpatialIndex.from_combatants(enemies)  # enemies by room, ids are list positions
+        self.mode = EXPLORE
+        self.fighter = None  # enemy currently fighting the player
+        self.last_location = [player.y_location, player.x_location]  # y, x of the room the player ran from
+        self.explored = dfog.ExploredMap(maze)  # rooms the player has entered
+        self.explored.reveal(player.x_location, player.y_location)
+
+    def __str__(self):
+        maze = 'a random maze' if self.maze_choice is None else f'Maze #{self.maze_choice + 1}'
+        return f"{self.player.name} at ({self.player.x_location}, {self.player.y_location}) " \
+               f"in {maze}, {self.mode} mode."
+
+    @classmethod
+    def new_game(cls, player_name, seed=None, enemy_count=3, maze_size=None, pool=None, maze_path=None):
+        """
+        Creates all required objects for a new game, as bv_dungeon_game.initialize does without UI
+        :param player_name: Name of the Player
+        :param seed: Seed for the game's DicePool, so the same seed and commands replay the same game
+        :param enemy_count: Number of enemies (on a built-in maze, up to three go in its preset rooms; with more,
+                            every enemy is placed in a random reachable room)
+        :param maze_size: Side of a random_maze to play instead of a built-in maze, exit in its farthest room
+        :param pool: DicePool to roll with instead of a new one made from seed (e.g. shared by a batch of games)
+        :param maze_path: Maze file (see dungeon_mazefile) to play instead, read tile by tile as the player reaches
+                          it; enemies spawn near the start
+        :return: GameEngine ready for its first command
+        """
+        pool = pool if pool is not None else dc.DicePool(seed)
+        d6 = dc.Die(6, pool)
+        d8 = dc.Die(8, pool)
+        d20 = dc.Die(20, pool)
+
+        enemies = [dc.Combatant(enemy_name(i), d6.stats_rolls()) for i in range(enemy_count)]
+        player = dc.Player(player_name, d6.stats_rolls())
+
+        if maze_path is not None:
+            maze_choice = None
+            maze_layout = dmazefile.open_maze(maze_path)
+            if maze_layout.finish is None:
+                raise ValueError(f'{maze_path} has no exit to play to.')
+        elif maze_size is None:
+            maze_choice, maze_layout = dfunc.maze_initialization(pool.roll(3, 1)[0] - 1)
+        else:
+            maze_choice = None
+            maze_layout = dg.MazeGrid.from_indexes(dfunc.random_maze(maze_size, pool.generator, as_array=True))
+            maze_layout.finish = dpaths.paths_for(maze_layout).farthest_from(0, 0)
+        dfunc.spawn_enemies(enemies, maze_choice, maze_layout, pool.generator)
+        return cls(maze_layout, player, enemies, d20, d8, maze_choice)
+
+    def step(self, command, direction=None):
+        """
+        Advances the game by one command
+        :param command: 'm' (with direction), 'l', 'c', 'h', 'r', 'x' while exploring; 'a', 'r' while fighting
+        :param direction: 'n', 'e', 's', or 'w' for the 'm' command
+        :return: List of Events describing what happened
+        """
+        events = []
+        if self.mode == EXPLORE:
+            self._explore(command, direction, events)
+        elif self.mode == FIGHT:
+            self._fight(command, events)
+        return events
+
+    def snapshot_extra(self):
+        """
+        State of a subclass that a dungeon_snapshot Snapshot doesn't already hold; a subclass defines this and
+        restore_extra itself to say it can be snapshotted, even when it has nothing extra to keep
+        :return: bytes, given back to restore_extra of the restored engine
+        """
+        return b''
+
+    def restore_extra(self, extra):
+        """
+        Restores what snapshot_extra packed, once the rest of the snapshot's state is in place
+        :param extra: bytes from snapshot_extra
+        :return: N/A
+        """
+
+    def close(self):
+        """
+        Releases anything the engine keeps outside memory (nothing for a GameEngine, see DungeonEngine); front ends
+        call it once a game is over
+        :return: N/A
+        """
+
+    def _explore(self, command, direction, events):
+        player = self.player
+
+        if command == 'm':
+            # Record last location
+            self.last_location = [player.y_location, player.x_location]
+            if player.try_move(direction, self.maze):
+                self.explored.reveal(player.x_location, player.y_location)
+                events.append(Event('moved', player.name, None, COMPASS[direction]))
+            elif direction in COMPASS:
+                events.append(Event('wall', player.name, None, COMPASS[direction]))
+                return
+            else:
+                events.append(Event('unknown_direction', player.name, value=direction))
+                return
+
+        elif command == 'l':
+            events.append(Event('look', player.name, self.maze.room(player.x_location, player.y_location)))
+
+        elif command == 'c':
+            maze_number = None if self.maze_choice is None else self.maze_choice + 1
+            events.append(Event('map', player.name, value=(player.x_location, player.y_location, maze_number)))
+
+        elif command == 'h':
+            events.append(Event('health', player.name, value=(player.HP, player.MaxHP)))
+
+        elif command == 'r':
+            self._rest(events)
+
+        elif command == 'x':
+            events.append(Event('quit', player.name))
+            self.mode = OVER
+            return
+
+        else:
+            events.append(Event('unknown_command', player.name, value=command))
+
+        # Set and check end of game conditions
+        if (player.x_location, player.y_location) == self.maze.finish and self._reach_exit(events):
+            return
+
+        self._check_encounter(events)
+
+    def _check_encounter(self, events):
+        """
+        Starts a fight with the first undefeated enemy in the player's room, once the player's turn is done
+        :param events: List of Events to add to
+        :return: True if a fight started
+        """
+        player = self.player
+        for entity in self.index.at(player.x_location, player.y_location):
+            enemy = self.enemies[entity]
+            if not enemy.defeated:
+                events.append(Event('encounter', player.name, enemy.name))
+                self.mode = FIGHT
+                self.fighter = enemy
+                return True
+        return False
+
+    def _reach_exit(self, events):
+        """
+        Handles the player standing on the exit
+        :param events: List of Events to add to
+        :return: True if the player left the maze, ending the turn
+        """
+        player = self.player
+        if all(enemy.defeated for enemy in self.enemies):
+            events.append(Event('victory', player.name))
+            self.mode = OVER
+            return True
+        events.append(Event('locked', player.name))
+        return False
+
+    def _rest(self, events):
+        player = self.player
+        rest_heal = player.heal(sum(self.d8.roll(1)))
+
+        # Enemy rest loop
+        rested = []
+        for enemy in self.enemies:
+            if not enemy.defeated:
+                if enemy.heal(sum(self.d8.roll(1)) // 2) > 0:
+                    rested.append(enemy.name)
+        events.append(Event('rest', player.name, tuple(rested), rest_heal))
+
+    def _fight(self, command, events):
+        player = self.player
+        fighter = self.fighter
+
+        if command == 'a':
+            # no initiative rolls for now, player always goes first...
+            self._attack(fighter, player, events)
+            if fighter.HP == 0:
+                events.append(Event('enemy_defeated', player.name, fighter.name))
+                fighter.defeated = 1
+                self._end_fight()
+
+            else:
+                self._attack(player, fighter, events)
+                if not self._player_defeated(events):
+                    events.append(Event('status', player.name, fighter.name, (player.HP, fighter.HP)))
+
+        elif command == 'r':  # DEX modifiers adds to escape chance
+            run_roll = sorted(self.d20.roll(3))[0:2]
+            if max(run_roll) >= 10 - player.modifiers[1]:
+                events.append(Event('escape', player.name))
+                player.y_location, player.x_location = self.last_location
+                self._end_fight()
+
+            else:
+                events.append(Event('stumble', player.name))
+                self._attack(player, fighter, events)
+                self._player_defeated(events)
+
+        else:
+            events.append(Event('unknown_command', player.name, value=command))
+
+    def _attack(self, target, attacker, events):
+        roll = sum(self.d20.roll(1))
+        hit = attacker.attack(roll, target)
+        damage = 0
+        if hit:
+            damage_dice = sum(self.d8.roll(hit))  # double rolls for critical
+            damage = target.sustain_damage(damage_dice, attacker)
+        events.append(Event('attack', attacker.name, target.name, (roll, target.AC, hit, damage)))
+
+    def _player_defeated(self, events):
+        player = self.player
+        if player.HP:
+            return 0
+
+        events.append(Event('player_defeated', self.fighter.name, player.name))
+        player.x_location = 0
+        player.y_location = 0
+        player.HP = 1
+        self.explored.reveal(0, 0)
+        self._end_fight()
+        return 1
+
+    def _end_fight(self):
+        self.mode = EXPLORE
+        self.fighter = None
+
+
+def enemy_name(number):
+    """
+    Names enemies in spawn order: the three classic names first, then numbered repeats
+    :param number: 0-based position of the enemy
+    :return: Name string, e.g. 'Oberon' or 'Oberon 2'
+    """
+    name = ENEMY_NAMES[number % len(ENEMY_NAMES)]
+    return name if number < len(ENEMY_NAMES) else f'{name} {number // len(ENEMY_NAMES) + 1}'
+
+
+def describe(event):
+    """
+    Turns an Event into the text the command line game prints for it
+    :param event: Event from GameEngine.step
+    :return: String of UI output (may span several lines)
+    """
+    kind, name, target, value = event
+
+    if kind == 'moved':
+        return f'{name} moves {value} into the next room\n'
+    elif kind == 'wall':
+        return f'{name} walks into a wall when attempting to move {value}\n'
+    elif kind == 'unknown_direction':
+        return f"Sorry, the command {value} was not recognized. Please re-enter a command.\n"
+    elif kind == 'unknown_command':
+        return f"I'm sorry, {value} was not recognized. Please re-enter a command.\n"
+    elif kind == 'look':
+        return f'{name} looks around the room...\n{target}\n'
+    elif kind == 'map':
+        maze = 'this maze' if value[2] is None else f'Maze #{value[2]}'
+        return f'{name} checks their map...\nYour current coordinates are ({value[0]}, {value[1]}) in {maze}.\n'
+    elif kind == 'health':
+        return f'{name} currently has {value[0]}/{value[1]}HP.\n'
+    elif kind == 'rest':
+        text = f'{name} takes a short rest at a fire...\n'
+        text += f'{name} regains {value}HP.\n' if value > 0 else f'{name} is already at full HP!\n'
+        return text + ''.join(f'{enemy} took a short rest as well...\n' for enemy in target)
+    elif kind == 'quit':
+        return 'Thanks for playing!'
+    elif kind == 'encounter':
+        return f'{name} spots an enemy in the room and charges at {target}!\n{name} charges at {target}!!\n'
+    elif kind == 'ambush':
+        return f'{target} wanders into the room!\n{name} charges at {target}!!\n'
+    elif kind == 'attack':
+        roll, armor_class, hit, damage = value
+        text = f"{name} rolled a {roll}!\n{target}'s AC is {armor_class}...\n"
+        if hit == 2:
+            return text + f'{name} scored a critical hit!!\n{name} dealt {damage} damage to {target}!\n'
+        elif hit == 1:
+            return text + f'{name} scored a hit!\n{name} dealt {damage} damage to {target}!\n'
+        return text + f"{name}'s attack missed...\n"
+    elif kind == 'status':
+        return f'{name} now has {value[0]}HP\n{target} now has {value[1]}HP\n'
+    elif kind == 'enemy_defeated':
+        return f'{name} defeated {target}!\n'
+    elif kind == 'player_defeated':
+        return f'{name} has defeated {target}!...\n' \
+               f'{target} awakens at the start of the maze, bruised, embarrassed, and barely alive to fight ' \
+               f'another day...\n* Your health points have been restored to 1 and you have moved to (0, 0) *\n'
+    elif kind == 'escape':
+        return f'{name} makes a narrow escape to the previous room!\n'
+    elif kind == 'stumble':
+        return f"{name} stumbles and can't get away!\n"
+    elif kind == 'locked':
+        return f"{name} has made it to the end of the maze... but enemies remain and the exit won't open..."
+    elif kind == 'victory':
+        return f'{name} has made it to the end of the maze and defeated all enemies! Congratulations!!\n' \
+               f'Thanks for playing!'
+    elif kind == 'descend':
+        return f'{name} has defeated all enemies and the exit opens onto stairs down...\n' \
+               f'{name} descends to level {value + 1} of the dungeon.\n'
+    elif kind == 'ascend':
+        return f'{name} climbs the stairs back up to level {value + 1} of the dungeon.\n'
+    elif kind == 'no_stairs':
+        return f'{name} finds no stairs up here; they are in the first room of every level below the first.\n'
+    return f'{kind}: {name} {target} {value}'
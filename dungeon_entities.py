@@ -0,0 +1,192 @@
+"""
+Bulk combatant storage for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+EntityStore: keeps names, stats, modifiers, AC, HP, MaxHP, location, and defeated flags of many combatants
+in NumPy columns (~30 bytes each) so they can be created and updated in bulk
+CombatantView: Combatant-compatible object reading and writing one entity of an EntityStore,
+so existing code (attack_target, rest, GameEngine, ...) works unchanged
+"""
+
+import numpy as np
+
+import dungeon_classes as dc
+import dungeon_simulation as ds
+
+
+# Column name -> (dtype, values per entity)
+COLUMNS = {'name_ids': (np.int32, 1),
+           'stats': (np.int8, 6),
+           'modifiers': (np.int8, 6),
+           'AC': (np.int16, 1),
+           'HP': (np.int16, 1),
+           'MaxHP': (np.int16, 1),
+           'x_location': (np.int32, 1),
+           'y_location': (np.int32, 1),
+           'defeated': (np.int8, 1),
+           }
+
+
+def _column(name):
+    return property(lambda self: self._columns[name][:self.count],
+                    doc=f'{name} of every entity (a view, so writes go to the store)')
+
+
+class EntityStore:
+
+    name_ids = _column('name_ids')  # index into names for each entity
+    stats = _column('stats')  # reminder: STR, DEX, CON, INT, WIS, CHR
+    modifiers = _column('modifiers')
+    AC = _column('AC')
+    HP = _column('HP')
+    MaxHP = _column('MaxHP')
+    x_location = _column('x_location')
+    y_location = _column('y_location')
+    defeated = _column('defeated')
+
+    def __init__(self, capacity=1024):
+        self.count = 0
+        self.names = []  # each distinct name is stored once
+        self._name_ids = {}
+        self._columns = {name: np.zeros((capacity, width) if width > 1 else capacity, dtype=dtype)
+                         for name, (dtype, width) in COLUMNS.items()}
+
+    def __len__(self):
+        return self.count
+
+    def __str__(self):
+        return f"{self.count} entities, {int(self.defeated.sum())} defeated, {len(self.names)} distinct names."
+
+    def name_id(self, name):
+        """
+        :param name: Combatant name
+        :return: Integer id of the name, added to names if new
+        """
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def _reserve(self, extra):
+        capacity = len(self._columns['HP'])
+        if self.count + extra <= capacity:
+            return
+        capacity = max(2 * capacity, self.count + extra)
+        for name, column in self._columns.items():
+            grown = np.zeros((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            self._columns[name] = grown
+
+    def add_many(self, names, stats, x_locations=0, y_locations=0):
+        """
+        Adds entities in bulk, calculating modifiers, AC, and MaxHP like Combatant.__init__
+        :param names: One name for all new entities, or a list with one name each
+        :param stats: (count, 6) array of [STR, DEX, CON, INT, WIS, CHR] stat blocks
+        :param x_locations: Column of each entity (scalar or array)
+        :param y_locations: Row of each entity (scalar or array)
+        :return: Array of the new entity ids
+        """
+        stats = np.asarray(stats, dtype=COLUMNS['stats'][0]).reshape(-1, 6)  # one row per entity, even for none
+        count = len(stats)
+        self._reserve(count)
+        new = slice(self.count, self.count + count)
+        self.count += count
+
+        columns = self._columns
+        if isinstance(names, str):
+            columns['name_ids'][new] = self.name_id(names)
+        else:
+            columns['name_ids'][new] = [self.name_id(name) for name in names]
+        columns['stats'][new] = stats
+        columns['x_location'][new] = x_locations
+        columns['y_location'][new] = y_locations
+        columns['defeated'][new] = 0
+        self.recalculate(np.arange(new.start, new.stop))
+        columns['HP'][new] = columns['MaxHP'][new]
+        return np.arange(new.start, new.stop)
+
+    def add(self, name, stats, x_location=0, y_location=0, defeated=0):
+        """
+        Adds one entity, with the same arguments as Combatant
+        :return: CombatantView of the new entity
+        """
+        entity = self.add_many([name], [stats], x_location, y_location)[0]
+        self.defeated[entity] = defeated
+        return CombatantView(self, entity)
+
+    @classmethod
+    def from_combatants(cls, combatants):
+        """
+        Copies existing Combatant objects (including current HP) into a new store, e.g.
+        EntityStore.from_combatants(enemies) for a game's enemies, or EntityStore.from_combatants([]) for an
+        empty store to add_many into
+        :param combatants: List of Combatant objects
+        :return: EntityStore
+        """
+        store = cls(max(1, len(combatants)))
+        store.add_many([c.name for c in combatants], [c.stats for c in combatants],
+                       [c.x_location for c in combatants], [c.y_location for c in combatants])
+        store.HP[:] = [c.HP for c in combatants]
+        store.defeated[:] = [c.defeated for c in combatants]
+        return store
+
+    def recalculate(self, entities=None):
+        """
+        Recalculates modifiers, AC (leather armor), and MaxHP (level 1 rogue) from stats, like Combatant.__init__
+        :param entities: Array of entity ids (defaults to all)
+        :return: N/A
+        """
+        if entities is None:
+            entities = slice(0, self.count)
+        modifiers, armor_class, max_hp = ds.combat_stats(self._columns['stats'][entities])
+        self._columns['modifiers'][entities] = modifiers
+        self._columns['AC'][entities] = armor_class
+        self._columns['MaxHP'][entities] = max_hp
+
+    def view(self, entity):
+        """
+        :param entity: Entity id
+        :return: CombatantView of that entity
+        """
+        return CombatantView(self, entity)
+
+    def views(self):
+        """
+        :return: List of CombatantView objects, one per entity
+        """
+        return [CombatantView(self, entity) for entity in range(self.count)]
+
+
+def _field(name, convert=int):
+    def get(self):
+        return convert(self.store._columns[name][self.entity])
+
+    def set(self, value):
+        self.store._columns[name][self.entity] = value
+
+    return property(get, set)
+
+
+class CombatantView(dc.Combatant):
+
+    # Every Combatant attribute reads and writes the store's columns
+    stats = _field('stats', lambda row: row.tolist())
+    modifiers = _field('modifiers', lambda row: row.tolist())
+    AC = _field('AC')
+    HP = _field('HP')
+    MaxHP = _field('MaxHP')
+    x_location = _field('x_location')
+    y_location = _field('y_location')
+    defeated = _field('defeated')
+
+    def __init__(self, store, entity):
+        # Combatant.__init__ is skipped: everything it would set already lives in the store
+        self.store = store
+        self.entity = entity
+
+    @property
+    def name(self):
+        return self.store.names[self.store._columns['name_ids'][self.entity]]
+
+    @name.setter
+    def name(self, value):
+        self.store._columns['name_ids'][self.entity] = self.store.name_id(value)
@@ -0,0 +1,142 @@
+"""
+Exact fight odds for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+Solves a fight as a Markov chain over (attacker HP, defender HP) states instead of sampling it like
+dungeon_simulation, following the Combatant.attack, sustain_damage, and attack_target rules and the fight_loop
+order of play, including its run away rule
+swing_distribution: exact damage distribution of one attack
+escape_probability: chance that running away works, for a DEX modifier
+fight_table: win, loss, escape, and expected length for every starting HP of a matchup (solved once, then cached)
+fight_odds / matchup_odds: FightOdds for one fight, from numbers or from two Combatant objects
+"""
+
+from collections import namedtuple
+import functools
+
+import numpy as np
+
+
+# win / loss / escape: probability the attacker wins, loses, or runs away; rounds: expected number of rounds
+FightOdds = namedtuple('FightOdds', ['win', 'loss', 'escape', 'rounds'])
+
+
+@functools.lru_cache(maxsize=None)
+def swing_distribution(str_mod, target_ac):
+    """
+    Damage dealt by one attack, like attack_target: a natural 20 is a critical (2d8 + STR), a roll meeting the
+    target's AC is a hit (1d8 + STR), anything else a miss (0); damage can be negative, which heals the target
+    :param str_mod: Attacker STR modifier
+    :param target_ac: Target armor class
+    :return: Dictionary of damage -> probability
+    """
+    hits = sum(1 for roll in range(1, 20) if roll >= target_ac)
+    distribution = {0: (19 - hits) / 20}
+    for die in range(1, 9):
+        damage = die + str_mod
+        distribution[damage] = distribution.get(damage, 0) + hits / 20 / 8
+        for second_die in range(1, 9):
+            damage = die + second_die + str_mod
+            distribution[damage] = distribution.get(damage, 0) + 1 / 20 / 64
+    return distribution
+
+
+def escape_probability(dex_mod):
+    """
+    Chance of escaping with the fight_loop run rule: the middle of three d20 rolls must reach 10 - DEX modifier
+    :param dex_mod: Attacker DEX modifier
+    :return: Probability between 0 and 1
+    """
+    single = min(1, max(0, (21 - (10 - dex_mod)) / 20))  # chance one d20 reaches the target
+    return 3 * single ** 2 * (1 - single) + single ** 3
+
+
+def _hp_transitions(str_mod, target_ac, target_max_hp):
+    """
+    :return: (target_max_hp + 1, target_max_hp + 1) array, entry [hp, new_hp] is the chance one attack
+             takes the target from hp to new_hp (saturated between 0 and MaxHP like sustain_damage)
+    """
+    transitions = np.zeros((target_max_hp + 1, target_max_hp + 1))
+    for damage, probability in swing_distribution(str_mod, target_ac).items():
+        for hp in range(1, target_max_hp + 1):
+            transitions[hp, min(target_max_hp, max(0, hp - damage))] += probability
+    transitions[0, 0] = 1
+    return transitions
+
+
+@functools.lru_cache(maxsize=4096)
+def fight_table(attacker_str, attacker_ac, attacker_max_hp, defender_str, defender_ac, defender_max_hp,
+                run_at=0, attacker_dex=0):
+    """
+    Solves every starting HP of one matchup at once; each round the attacker swings (or tries to run while at or
+    below run_at HP) and the defender answers if still standing
+    :param attacker_str: Attacker STR modifier
+    :param attacker_ac: Attacker armor class
+    :param attacker_max_hp: Attacker MaxHP
+    :param defender_str: Defender STR modifier
+    :param defender_ac: Defender armor class
+    :param defender_max_hp: Defender MaxHP
+    :param run_at: The attacker runs away instead of attacking while its HP is at or below this (0 never runs)
+    :param attacker_dex: Attacker DEX modifier, used by the run rule
+    :return: FightOdds of (attacker_max_hp + 1, defender_max_hp + 1) read-only arrays indexed by [attacker HP,
+             defender HP] (a side at 0 HP has already lost)
+    """
+    attacker_hits = _hp_transitions(attacker_str, defender_ac, defender_max_hp)  # defender HP after a swing
+    defender_hits = _hp_transitions(defender_str, attacker_ac, attacker_max_hp)  # attacker HP after a swing
+    a_states, d_states = attacker_max_hp, defender_max_hp
+    running = (np.arange(1, a_states + 1) <= run_at)[:, None]  # per attacker HP, broadcast over defender HP
+    escape = escape_probability(attacker_dex)
+
+    # Live states are (attacker HP, defender HP) from 1 up, numbered attacker HP major
+    answer = defender_hits[1:, 1:]  # attacker HP change when the defender answers and the attacker survives
+    fight = np.kron(answer, attacker_hits[1:, 1:])  # attacker swings and the defender survives, then answers
+    flee = (1 - escape) * np.kron(answer, np.eye(d_states))  # failed run: the defender swings
+    transitions = np.where(np.repeat(running.ravel(), d_states)[:, None], flee, fight)
+
+    # Chances of leaving the live states, per state
+    win = np.where(running, 0, np.broadcast_to(attacker_hits[1:, 0], (a_states, d_states)))
+    survive = np.where(running, 1 - escape, 1 - attacker_hits[1:, 0][None, :])
+    loss = survive * defender_hits[1:, 0][:, None]
+    fled = np.where(running, escape, 0.0) * np.ones((a_states, d_states))
+
+    # Absorption probabilities and expected rounds: (I - Q) x = b for every right hand side at once
+    targets = np.stack([win.ravel(), loss.ravel(), fled.ravel(), np.ones(a_states * d_states)], axis=1)
+    solved = np.linalg.solve(np.eye(a_states * d_states) - transitions, targets)
+
+    tables = []
+    for column, dead_attacker, dead_defender in zip(solved.T, (0, 1, 0, 0), (1, 0, 0, 0)):
+        table = np.zeros((a_states + 1, d_states + 1))
+        table[1:, 1:] = column.reshape(a_states, d_states)
+        table[0, :] = dead_attacker
+        table[1:, 0] = dead_defender
+        table.flags.writeable = False
+        tables.append(table)
+    return FightOdds(*tables)
+
+
+def fight_odds(attacker_str, attacker_ac, attacker_max_hp, defender_str, defender_ac, defender_max_hp,
+               attacker_hp=None, defender_hp=None, run_at=0, attacker_dex=0):
+    """
+    Exact odds of one fight, using the cached fight_table of the matchup
+    :param attacker_hp: Starting attacker HP (defaults to MaxHP)
+    :param defender_hp: Starting defender HP (defaults to MaxHP)
+    (other parameters as in fight_table)
+    :return: FightOdds of floats
+    """
+    table = fight_table(attacker_str, attacker_ac, attacker_max_hp, defender_str, defender_ac, defender_max_hp,
+                        run_at, attacker_dex)
+    row = attacker_max_hp if attacker_hp is None else attacker_hp
+    column = defender_max_hp if defender_hp is None else defender_hp
+    return FightOdds(table.win.item(row, column), table.loss.item(row, column),
+                     table.escape.item(row, column), table.rounds.item(row, column))
+
+
+def matchup_odds(attacker, defender, run_at=0):
+    """
+    Exact odds of a fight between two Combatant objects from their current HP, the attacker swinging first
+    :param attacker: Combatant that swings first (the player in fight_loop)
+    :param defender: Combatant that answers each attack
+    :param run_at: The attacker runs away while its HP is at or below this (0 never runs)
+    :return: FightOdds of floats
+    """
+    return fight_odds(attacker.modifiers[0], attacker.AC, attacker.MaxHP,
+                      defender.modifiers[0], defender.AC, defender.MaxHP,
+                      attacker.HP, defender.HP, run_at, attacker.modifiers[1] if run_at else 0)
@@ -0,0 +1,142 @@
+"""
+Fog of war for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+ExploredMap: rooms a player has entered, one bit per room in 64x64 room pages that are only allocated once
+something in them is explored, so memory follows what the player has explored rather than the size of the maze.
+A room counts as seen once it has been entered or a room next to it that opens onto it has been; revealing and
+querying a room are O(1).
+MazeRenderer draws only the seen part of the maze, cropped to the explored region, when given an ExploredMap.
+"""
+
+import struct
+
+
+PAGE_BITS = 6
+PAGE_SIZE = 1 << PAGE_BITS  # pages are PAGE_SIZE x PAGE_SIZE rooms
+PAGE_BYTES = PAGE_SIZE * PAGE_SIZE // 8
+
+# to_bytes layout (little-endian): width, height, pages, rooms entered (uint32), left, top, right, bottom of the
+# entered rooms (int32, -1 before any), then per page: page x, page y (uint32), bits
+HEADER = struct.Struct('<IIIIiiii')
+PAGE = struct.Struct('<II')
+
+_OFFSET_MASK = PAGE_SIZE - 1
+
+# Door bit -> x, y offset of the room it opens onto, and the door of that room leading back (N=1, E=2, S=4, W=8)
+_NEIGHBOURS = [(1, 0, -1, 4), (2, 1, 0, 8), (4, 0, 1, 1), (8, -1, 0, 2)]
+
+
+class ExploredMap:
+
+    def __init__(self, maze):
+        """
+        :param maze: MazeGrid or TiledMaze being explored
+        """
+        self.maze = maze
+        self._pages = {}  # (page x, page y) -> bytearray bitset of the rooms entered
+        self._bounds = None  # [left, top, right, bottom] of the entered rooms, inclusive
+        self.revision = 0  # bumped whenever a room is first entered, so renderers know to redraw
+        self.visited_count = 0
+
+    def __str__(self):
+        return f"{self.visited_count} rooms visited of a {self.maze.width}x{self.maze.height} maze."
+
+    @property
+    def nbytes(self):
+        return len(self._pages) * PAGE_BYTES
+
+    def reveal(self, x, y):
+        """
+        Marks a room as entered
+        :param x: Column of the room
+        :param y: Row of the room
+        :return: N/A
+        """
+        key = (x >> PAGE_BITS, y >> PAGE_BITS)
+        page = self._pages.get(key)
+        if page is None:
+            page = self._pages[key] = bytearray(PAGE_BYTES)
+        bit = ((y & _OFFSET_MASK) << PAGE_BITS) | (x & _OFFSET_MASK)
+        flag = 1 << (bit & 7)
+        if page[bit >> 3] & flag:
+            return
+        page[bit >> 3] |= flag
+        self.visited_count += 1
+        self.revision += 1
+
+        bounds = self._bounds
+        if bounds is None:
+            self._bounds = [x, y, x, y]
+            return
+        if x < bounds[0]:
+            bounds[0] = x
+        elif x > bounds[2]:
+            bounds[2] = x
+        if y < bounds[1]:
+            bounds[1] = y
+        elif y > bounds[3]:
+            bounds[3] = y
+
+    def visited(self, x, y):
+        page = self._pages.get((x >> PAGE_BITS, y >> PAGE_BITS))
+        if page is None:
+            return False
+        bit = ((y & _OFFSET_MASK) << PAGE_BITS) | (x & _OFFSET_MASK)
+        return bool(page[bit >> 3] & (1 << (bit & 7)))
+
+    def seen(self, x, y):
+        """
+        :return: True if the room was entered, or can be seen through the open door of an entered room next to it
+        """
+        if self.visited(x, y):
+            return True
+        maze = self.maze
+        for door, x_step, y_step, back in _NEIGHBOURS:
+            x_next, y_next = x + x_step, y + y_step
+            if 0 <= x_next < maze.width and 0 <= y_next < maze.height and self.visited(x_next, y_next) and \
+                    maze.door_mask(x_next, y_next) & back:
+                return True
+        return False
+
+    @property
+    def bounds(self):
+        """
+        :return: (left, top, right, bottom) that every seen room is inside, or None before any room is entered
+        """
+        if self._bounds is None:
+            return None
+        left, top, right, bottom = self._bounds
+        return max(left - 1, 0), max(top - 1, 0), min(right + 1, self.maze.width - 1), \
+            min(bottom + 1, self.maze.height - 1)
+
+    def to_bytes(self):
+        """
+        Packs the entered rooms into a binary blob
+        :return: bytes
+        """
+        parts = [HEADER.pack(self.maze.width, self.maze.height, len(self._pages), self.visited_count,
+                             *(self._bounds or (-1, -1, -1, -1)))]
+        for key, page in self._pages.items():
+            parts += [PAGE.pack(*key), bytes(page)]
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, blob, maze):
+        """
+        Unpacks a blob from to_bytes
+        :param blob: bytes
+        :param maze: The maze the blob was explored on
+        :return: ExploredMap
+        """
+        width, height, count, visited_count, *bounds = HEADER.unpack_from(blob)
+        if (width, height) != (maze.width, maze.height):
+            raise ValueError(f'Explored map of a {width}x{height} maze does not fit a {maze.width}x{maze.height} one.')
+        explored = cls(maze)
+        offset = HEADER.size
+        for _ in range(count):
+            key = PAGE.unpack_from(blob, offset)
+            offset += PAGE.size
+            explored._pages[key] = bytearray(blob[offset:offset + PAGE_BYTES])
+            offset += PAGE_BYTES
+        explored.visited_count = explored.revision = visited_count
+        explored._bounds = bounds if visited_count else None
+        return explored
@@ -3,215 +3,266 @@ Contains all function for Dungeon Crawler
 Taken from previous projects "Combat Game", and "Maze Game"
 """
 
-import numpy as np
+import functools
 import random
 
-import dungeon_classes as dc
+import dungeon_grid as dg
+import dungeon_lazy as dlazy
+import dungeon_paths as dpaths
+import dungeon_render as drender
+
+np = dlazy.LazyModule('numpy')
 
 
 # Maze Navigation
-def maze_initialization():
-    # create all possible rooms
-    rooms = [dc.Room([0, 0, 0, 0]),  # Closed room(0)
-             dc.Room([1, 1, 1, 1]),  # Open room(1)
-             dc.Room([1, 0, 1, 0]),  # NS corridor(2)
-             dc.Room([0, 1, 0, 1]),  # EW corridor(3)
-             dc.Room([1, 0, 0, 1]),  # NW corner(4)
-             dc.Room([1, 1, 0, 0]),  # NE corner(5)
-             dc.Room([0, 1, 1, 0]),  # SE corner(6)
-             dc.Room([0, 0, 1, 1]),  # SW corner(7)
-             dc.Room([1, 1, 0, 1]),  # EW with N tee(8)
-             dc.Room([1, 1, 1, 0]),  # NS with E tee(9)
-             dc.Room([0, 1, 1, 1]),  # EW with S tee(10)
-             dc.Room([1, 0, 1, 1]),  # NS with W tee(11)
-             dc.Room([1, 0, 0, 0]),  # N dead end(12)
-             dc.Room([0, 1, 0, 0]),  # E dead end(13)
-             dc.Room([0, 0, 1, 0]),  # S dead end(14)
-             dc.Room([0, 0, 0, 1]),  # W dead end(15)
-             ]
-    # create list using room indexes (will be converted when chosen)
-    maze_1 = [[13, 3, 10, 7, 14, 0, 0],
-              [13, 3, 4, 5, 11, 0, 0],
-              [6, 7, 6, 3, 8, 7, 0],
-              [2, 5, 1, 3, 15, 2, 0],
-              [5, 3, 8, 7, 6, 4, 0],
-              [0, 0, 0, 5, 11, 0, 0],
-              [0, 0, 0, 0, 5, 3, 15],
-              ]
-    maze_2 = [[13, 10, 3, 3, 7, 14, 0, 14, 0, 0, 0],
-              [0, 2, 13, 3, 4, 2, 0, 2, 0, 0, 0],
-              [0, 5, 10, 3, 7, 2, 0, 9, 3, 3, 7],
-              [0, 13, 4, 6, 8, 4, 14, 12, 14, 0, 2],
-              [0, 0, 6, 8, 3, 7, 2, 0, 5, 3, 11],
-              [0, 13, 1, 3, 7, 12, 2, 6, 7, 13, 11],
-              [0, 0, 2, 14, 5, 3, 8, 11, 5, 3, 4],
-              [0, 0, 5, 4, 0, 13, 3, 4, 0, 0, 0],
-              ]
-    maze_3 = [[13, 3, 7, 13, 7, 0, 14],
-              [14, 13, 8, 7, 2, 0, 2],
-              [2, 6, 7, 5, 8, 7, 2],
-              [5, 4, 5, 3, 3, 8, 4],
-              ]
-
-    # create list of mazes, choose random maze for game, convert maze indexes to rooms
-    mazes = [maze_1, maze_2, maze_3]  # random maze not used at this time
-    maze_choice = random.choice(range(0, len(mazes)))
-    maze_layout = mazes[maze_choice]
-    maze_layout = index_to_rooms(maze_layout, rooms)
-    return maze_choice, maze_layout
+# Built-in mazes using room indexes (converted to a MazeGrid when chosen)
+_MAZE_1 = [[13, 3, 10, 7, 14, 0, 0],
+           [13, 3, 4, 5, 11, 0, 0],
+           [6, 7, 6, 3, 8, 7, 0],
+           [2, 5, 1, 3, 15, 2, 0],
+           [5, 3, 8, 7, 6, 4, 0],
+           [0, 0, 0, 5, 11, 0, 0],
+           [0, 0, 0, 0, 5, 3, 15],
+           ]
+_MAZE_2 = [[13, 10, 3, 3, 7, 14, 0, 14, 0, 0, 0],
+           [0, 2, 13, 3, 4, 2, 0, 2, 0, 0, 0],
+           [0, 5, 10, 3, 7, 2, 0, 9, 3, 3, 7],
+           [0, 13, 4, 6, 8, 4, 14, 12, 14, 0, 2],
+           [0, 0, 6, 8, 3, 7, 2, 0, 5, 3, 11],
+           [0, 13, 1, 3, 7, 12, 2, 6, 7, 13, 11],
+           [0, 0, 2, 14, 5, 3, 8, 11, 5, 3, 4],
+           [0, 0, 5, 4, 0, 13, 3, 4, 0, 0, 0],
+           ]
+_MAZE_3 = [[13, 3, 7, 13, 7, 0, 14],
+           [14, 13, 8, 7, 2, 0, 2],
+           [2, 6, 7, 5, 8, 7, 2],
+           [5, 4, 5, 3, 3, 8, 4],
+           ]
+BUILTIN_MAZES = [_MAZE_1, _MAZE_2, _MAZE_3]  # random maze not used at this time
+BUILTIN_FINISHES = [(6, 6), (7, 0), (0, 1)]  # x, y of each maze's exit
+
+
+@functools.lru_cache(maxsize=None)
+def _builtin_masks(maze_choice):
+    """
+    Door masks of a built-in maze, converted once and shared read-only by every game on it
+    :param maze_choice: index of the maze
+    :return: uint8 array of door masks
+    """
+    masks = dg.MazeGrid.from_indexes(BUILTIN_MAZES[maze_choice]).masks
+    masks.flags.writeable = False
+    return masks
 
 
-def vizualize_maze(maze_to_draw):
+def maze_initialization(maze_choice=None):
     """
-    Uses Box Drawing unicode (u2500 - u257F) to draw the maze_to_draw
-    :param maze_to_draw: Maze to be visualized
-    :return: UI printout of maze_to_draw
+    Builds the chosen built-in maze
+    :param maze_choice: index of the maze to use, picked at random when None
+    :return: maze_choice, MazeGrid of the maze with its exit set
     """
+    if maze_choice is None:
+        maze_choice = random.choice(range(0, len(BUILTIN_MAZES)))
+    maze_layout = dg.MazeGrid(_builtin_masks(maze_choice), BUILTIN_FINISHES[maze_choice])
+    return maze_choice, maze_layout
 
-    # Create dictionary for box drawing unicode lookup
-    # NOTE: each character uses a space before the symbol
-    encoding = {0: ' \u2573',  # Closed room
-                1: ' \u253C',  # Open room
-                2: ' \u2502',  # NS corridor
-                3: ' \u2500',  # EW corridor
-                4: ' \u2518',  # NW corner
-                5: ' \u2514',  # NE corner
-                6: ' \u250C',  # SE corner
-                7: ' \u2510',  # SW corner
-                8: ' \u2534',  # EW with N tee
-                9: ' \u251C',  # NS with E tee
-                10: ' \u252C',  # EW with S tee
-                11: ' \u2524',  # NS with W tee
-                12: ' \u257D',  # N dead end
-                13: ' \u257E',  # E dead end
-                14: ' \u257F',  # S dead end
-                15: ' \u257C',  # W dead end
-                }
-
-    # Determine shape of maze_to_draw
-    x_len = len(maze_to_draw[0])
-    y_len = len(maze_to_draw)
-
-    draw = ['' for x in range(y_len)]
-    # Encode maze_to_draw
-    for i in range(0, x_len):  # columns
-        for j in range(0, y_len):  # rows
-            draw[j] += encoding[maze_to_draw[j][i]]
-
-    for row in draw:
-        print(row)
-    print()
 
+SPAWN_WINDOW = 256  # side of the area around the start that random_spawn_rooms reads on a TiledMaze
 
-def random_maze(size):
+# Preset spawn rooms (x, y) for the enemies of each built-in maze
+SPAWN_ROOMS = [[[3, 1], [2, 3], [5, 6]],
+               [[4, 3], [7, 6], [7, 1]],
+               [[2, 1], [5, 3], [0, 2]],
+               ]
+
+
+def spawn_enemies(enemies, maze_choice=None, maze=None, seed=None, start=(0, 0)):
     """
-    Creates a random square maze of dimension = size
-    :param size: Square dimension of desired maze
-    :return: A list describing a random maze using index format
+    Places enemies at the preset locations of a built-in maze, or in random reachable rooms of any maze
+    :param enemies: A list of enemies in the field
+    :param maze_choice: int index of which built-in maze was chosen (None for other mazes)
+    :param maze: MazeGrid or TiledMaze used when there is no preset for these enemies (e.g. random_maze output)
+    :param seed: Seed or numpy Generator for random spawn rooms
+    :param start: (x, y) of the player's starting room, which stays free of enemies
+    :return: List of [x, y] spawn rooms, one per enemy
     """
+    if maze_choice is not None and len(enemies) <= len(SPAWN_ROOMS[maze_choice]):
+        spawn_rooms = SPAWN_ROOMS[maze_choice][:len(enemies)]
+    else:
+        spawn_rooms = random_spawn_rooms(maze, len(enemies), seed, start).tolist()
 
-    # Pad maze with 0 with zero index perimeter
-    size += 2
-    new_maze = np.empty((size, size))
-    new_maze[0, :] = np.zeros((1, size))
-    new_maze[-1, :] = np.zeros((1, size))
-    new_maze[:, 0] = np.zeros(size)
-    new_maze[:, -1] = np.zeros(size)
-
-    # Define possible indexes for each compass direction (all options)
-    north = [1, 2, 4, 5, 8, 9, 11, 12]
-    east = [1, 3, 5, 6, 8, 9, 10, 13]
-    south = [1, 2, 6, 7, 9, 10, 11, 14]
-    west = [1, 3, 4, 7, 8, 10, 11, 15]
+    for enemy, (x, y) in zip(enemies, spawn_rooms):
+        enemy.x_location = x
+        enemy.y_location = y
 
-    # Set starting position
-    new_maze[1][1] = 13
+    return spawn_rooms
 
-    # Loop through by row ensuring room connections
-    for i in range(1, size - 1):
 
-        for j in range(0, size - 2):
-            # Determine if a connection is needed to adjacent rooms
-            left_door = 1 if new_maze[i][j] in east else 0
-            top_door = 1 if new_maze[i - 1][j + 1] in south else 0
-            # bottom_door = 1 if new_maze[i + 1][j + 1] in north else 0
-            # right_door = 1 if new_maze[i][j + 1] in west else 0
+def random_spawn_rooms(maze, count, seed=None, start=(0, 0)):
+    """
+    Chooses rooms the player can reach, other than the start and the exit, spread over distinct rooms when possible
+    On a TiledMaze (dungeon_mazefile) only the SPAWN_WINDOW x SPAWN_WINDOW rooms around the start are read, and
+    enemies spawn in the rooms reachable without leaving them
+    :param maze: MazeGrid or TiledMaze to spawn in
+    :param count: Number of spawn rooms
+    :param seed: Seed or numpy Generator
+    :param start: (x, y) of the player's starting room
+    :return: (count, 2) array of x, y
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    left = top = 0
+    finish = maze.finish
+    if not isinstance(maze, dg.MazeGrid):
+        left = min(max(start[0] - SPAWN_WINDOW // 2, 0), max(maze.width - SPAWN_WINDOW, 0))
+        top = min(max(start[1] - SPAWN_WINDOW // 2, 0), max(maze.height - SPAWN_WINDOW, 0))
+        maze = dg.MazeGrid(maze.region(left, top, min(left + SPAWN_WINDOW, maze.width),
+                                       min(top + SPAWN_WINDOW, maze.height)))
+        start = (start[0] - left, start[1] - top)
+        if finish is not None:
+            finish = (finish[0] - left, finish[1] - top)
+
+    reachable = dpaths.paths_for(maze).distances_from(*start) > 0
+    if finish is not None and 0 <= finish[0] < maze.width and 0 <= finish[1] < maze.height:
+        reachable[finish[1], finish[0]] = False
+
+    rooms = np.flatnonzero(reachable)
+    if not rooms.size:
+        raise ValueError('No reachable rooms to spawn enemies in.')
+    rooms = rng.choice(rooms, size=count, replace=count > rooms.size)
+    return np.stack([rooms % maze.width + left, rooms // maze.width + top], axis=1)
 
-            if i < size - 2:  # for all rows above bottom row of actual maze
 
-                if j < size - 3:  # for all columns before rightmost of actual maze
+def vizualize_maze(maze_to_draw):
+    """
+    Uses Box Drawing unicode (u2500 - u257F) to draw the maze_to_draw
+    :param maze_to_draw: Maze to be visualized
+    :return: UI printout of maze_to_draw
+    """
 
-                    # Choose room at random that will connect with adjacent rooms
-                    if left_door:
-                        if top_door:
-                            options = list(set(west) & set(north))
+    for row in maze_to_draw:
+        print(''.join([drender.ROOM_GLYPHS[room] for room in row]))
+    print()
 
-                        else:
-                            options = list(set(west) - set(north))
-                    else:
-                        if top_door:
-                            options = list(set(north) - set(west))
 
-                        else:
-                            options = list((set(south) & set(east)) - set(north) - set(west))
+def random_maze(size, seed=None, as_array=False):
+    """
+    Creates a random square maze of dimension = size
+    :param size: Square dimension of desired maze
+    :param seed: Seed or numpy Generator for a reproducible maze
+    :param as_array: Return a uint8 array instead of nested lists
+    :return: A list (or array) describing a random maze using index format
+    """
+    new_maze = np.empty((size, size), dtype=np.uint8)
+    for i, row in enumerate(random_maze_rows(size, size, seed)):
+        new_maze[i] = row
 
-                else:
+    return new_maze if as_array else np.ndarray.tolist(new_maze)
 
-                    # Right edge of maze... can never go east
-                    if left_door:
-                        if top_door:
-                            options = list((set(west) & set(north)) - set(east))
 
-                        else:
-                            options = list((set(west) - set(north)) - set(east))
-                    else:
-                        if top_door:
-                            options = list(set(north) - set(west) - set(east))
+def random_maze_rows(width, height, seed=None):
+    """
+    Generates a random maze one row at a time, keeping only the row above in memory, so mazes of any height
+    can be streamed to a file (see dungeon_mazefile.save_maze_rows) or checked as they are made
+    (random_maze(size, seed) collects the rows of random_maze_rows(size, size, seed))
+    :param width: Number of rooms in each row
+    :param height: Number of rows
+    :param seed: Seed or numpy Generator for a reproducible maze
+    :return: Generator of uint8 arrays of room indexes, from the top row down
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
 
-                        else:
-                            options = list(set(south) - set(north) - set(west) - set(east))
+    has_south = _maze_tables()[1]
+    top_doors = np.zeros(width, dtype=np.intp)  # row above the maze is closed
+    for i in range(height):
+        row = _random_maze_row(top_doors, rng, first=i == 0, bottom=i == height - 1)
+        top_doors = has_south[row]
+        yield row
 
-            else:  # Bottom edge of maze... can never go south
 
-                if j < size - 3:  # for all columns before rightmost of actual maze
+# Define possible indexes for each compass direction (all options)
+_NORTH_ROOMS = [1, 2, 4, 5, 8, 9, 11, 12]
+_EAST_ROOMS = [1, 3, 5, 6, 8, 9, 10, 13]
+_SOUTH_ROOMS = [1, 2, 6, 7, 9, 10, 11, 14]
+_WEST_ROOMS = [1, 3, 4, 7, 8, 10, 11, 15]
 
-                    if left_door:
-                        if top_door:
-                            options = list((set(west) & set(north)) - set(south))
 
-                        else:
-                            options = list((set(west) - set(north)) - set(south))
-                    else:
-                        if top_door:
-                            options = list(set(north) - set(west) - set(south))
+def _room_options(left_door, top_door, right_edge, bottom_edge):
+    """
+    Lists the rooms that will connect with adjacent rooms
+    :param left_door: 1 if the room to the west opens east
+    :param top_door: 1 if the room to the north opens south
+    :param right_edge: 1 for the rightmost column of the maze (can never go east)
+    :param bottom_edge: 1 for the bottom row of the maze (can never go south)
+    :return: List of room indexes
+    """
+    options = [i for i in range(16)
+               if (i in _WEST_ROOMS) == left_door and (i in _NORTH_ROOMS) == top_door
+               and not (right_edge and i in _EAST_ROOMS) and not (bottom_edge and i in _SOUTH_ROOMS)]
 
-                        else:
-                            options = list(set(east) - set(west) - set(north) - set(south))
+    if not left_door and not top_door:
+        # Nothing leads into this room, so it opens every way it can to stay connected
+        options = [i for i in options if (i in _EAST_ROOMS) != right_edge and (i in _SOUTH_ROOMS) != bottom_edge]
+    return options
 
-                else:
-                    # Bottom right corner... can only go west and north
-                    if left_door:
-                        if top_door:
-                            options = list((set(west) & set(north)) - set(south) - set(east))
-
-                        else:
-                            options = list((set(west) - set(north)) - set(south) - set(east))
-                    else:
-                        if top_door:
-                            options = list(set(north) - set(west) - set(south) - set(east))
-
-                        else:
-                            options = [0]
-
-            if i == 1 and j == 1:
-                new_maze[1][1] = 13  # enforce starting position
-                new_maze[i][j + 1] = random.choice(list(set(options) - {15}))  # make sure dead end not beside start
-            else:
-                new_maze[i][j + 1] = random.choice(options)
 
-    # Extract actual maze
-    new_maze = new_maze[1:-1, 1:-1]
-    return np.ndarray.tolist(new_maze.astype(int))
+@functools.lru_cache(maxsize=None)
+def _maze_tables():
+    """
+    Precomputes room options for every (edge, left_door, top_door) case, once random_maze is first used
+    Edge is 0 inside the maze, 1 on the right edge, 2 on the bottom edge, and 3 in the bottom right corner.
+    Every case has 1, 2, or 4 options, so each is repeated to fill 4 equally likely slots.
+    :return: (has_east, has_south, options): 1/0 intp arrays of the east and south doors of each room code,
+             and the uint8 options array of shape (4, 2, 2, 4)
+    """
+    has_east = np.isin(np.arange(16), _EAST_ROOMS).astype(np.intp)
+    has_south = np.isin(np.arange(16), _SOUTH_ROOMS).astype(np.intp)
+    table = np.empty((4, 2, 2, 4), dtype=np.uint8)
+    for edge in range(4):
+        for left_door in (0, 1):
+            for top_door in (0, 1):
+                options = _room_options(left_door, top_door, edge & 1, edge >> 1)
+                table[edge, left_door, top_door] = options * (4 // len(options))
+    return has_east, has_south, table
+
+
+def _random_maze_row(top_doors, rng, first=False, bottom=False, left_door=0):
+    """
+    Chooses one row of rooms that connects with the row above and with each other
+    :param top_doors: 1/0 array of south openings in the row above
+    :param rng: numpy Generator
+    :param first: 1 for the first row, which holds the starting position
+    :param bottom: 1 for the bottom row of the maze
+    :param left_door: 1 if the room left of this row opens east
+    :return: uint8 array of room indexes
+    """
+    has_east, _, maze_options = _maze_tables()
+    width = len(top_doors)
+
+    if first and width > 1:
+        # enforce starting position and make sure a dead end isn't beside start
+        options = [i for i in _room_options(1, top_doors[1], width == 2, bottom) if i != 15] or [15]
+        start = np.array([13, options[rng.integers(len(options))]], dtype=np.uint8)
+        rest = _random_maze_row(top_doors[2:], rng, bottom=bottom, left_door=has_east[start[1]])
+        return np.concatenate([start, rest])
+
+    edge = np.full(width, 2 if bottom else 0, dtype=np.intp)
+    edge[-1:] += 1
+    slot = rng.integers(0, 4, size=width)
+
+    # Each room's east door depends only on whether the room to its left opens east:
+    # fixed if both choices agree, otherwise it copies or inverts the left room's east door
+    east_if_closed = has_east[maze_options[edge, 0, top_doors, slot]]
+    east_if_open = has_east[maze_options[edge, 1, top_doors, slot]]
+    fixed = east_if_closed == east_if_open
+    fixed[:1] = True
+    east_if_closed[:1] = east_if_open[:1] if left_door else east_if_closed[:1]
+
+    # Resolve the chain: east door = last fixed door, flipped once per inverting room since then
+    last_fixed = np.maximum.accumulate(np.where(fixed, np.arange(width), 0))
+    flips = np.cumsum(~fixed & (east_if_closed == 1))
+    east_doors = east_if_closed[last_fixed] ^ ((flips - flips[last_fixed]) & 1)
+
+    left_doors = np.concatenate([[left_door], east_doors[:-1]]).astype(np.intp)
+    return maze_options[edge, left_doors, top_doors, slot]
 
 
 def index_to_rooms(maze_x, rooms):
@@ -0,0 +1,126 @@
+"""
+Array-backed maze storage for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+Each cell holds a 4-bit door mask (North=1, East=2, South=4, West=8) in a uint8 NumPy grid,
+so a 10k x 10k maze takes ~100 MB and move checks are bit tests
+ROOM_DOORS / ROOMS: the 16 room templates indexed by room code
+ROOM_MASKS / MASK_ROOMS: lookup arrays between room codes and door masks (built when first used)
+MazeGrid: the maze itself, usable directly by Player.move, look_room, and the game loop
+"""
+
+import functools
+
+import dungeon_classes as dc
+import dungeon_lazy as dlazy
+
+np = dlazy.LazyModule('numpy')
+
+
+# All possible rooms as 1/0 pseudo-boolean lists of [North, East, South, West] openings, indexed by room code
+ROOM_DOORS = [[0, 0, 0, 0],  # Closed room(0)
+              [1, 1, 1, 1],  # Open room(1)
+              [1, 0, 1, 0],  # NS corridor(2)
+              [0, 1, 0, 1],  # EW corridor(3)
+              [1, 0, 0, 1],  # NW corner(4)
+              [1, 1, 0, 0],  # NE corner(5)
+              [0, 1, 1, 0],  # SE corner(6)
+              [0, 0, 1, 1],  # SW corner(7)
+              [1, 1, 0, 1],  # EW with N tee(8)
+              [1, 1, 1, 0],  # NS with E tee(9)
+              [0, 1, 1, 1],  # EW with S tee(10)
+              [1, 0, 1, 1],  # NS with W tee(11)
+              [1, 0, 0, 0],  # N dead end(12)
+              [0, 1, 0, 0],  # E dead end(13)
+              [0, 0, 1, 0],  # S dead end(14)
+              [0, 0, 0, 1],  # W dead end(15)
+              ]
+ROOMS = [dc.Room(doors) for doors in ROOM_DOORS]
+
+
+@functools.lru_cache(maxsize=None)
+def _lookup_tables():
+    """
+    The 16 room codes cover every door combination, so codes and masks convert both ways
+    :return: (ROOM_MASKS, MASK_ROOMS) uint8 arrays
+    """
+    room_masks = np.array([room.mask for room in ROOMS], dtype=np.uint8)
+    return room_masks, np.argsort(room_masks).astype(np.uint8)
+
+
+def __getattr__(name):
+    # ROOM_MASKS and MASK_ROOMS need NumPy, so they are only built when first used
+    if name == 'ROOM_MASKS':
+        return _lookup_tables()[0]
+    if name == 'MASK_ROOMS':
+        return _lookup_tables()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class MazeGrid:
+
+    def __init__(self, masks, finish=None):
+        self.masks = masks  # (height, width) uint8 array of door masks
+        self.finish = finish  # (x, y) of the exit, if the maze has one
+
+    def __str__(self):
+        return f"A {self.width}x{self.height} maze."
+
+    @classmethod
+    def from_indexes(cls, maze_indexes, finish=None):
+        """
+        Builds a grid from a maze in index format (nested lists or array of room codes)
+        :param maze_indexes: Maze described by room codes
+        :param finish: (x, y) of the exit, if the maze has one
+        :return: MazeGrid of door masks
+        """
+        # Indexing with the codes as they are (uint8 for random_maze arrays) avoids an 8 byte per room intp copy
+        return cls(_lookup_tables()[0][np.asarray(maze_indexes)], finish)
+
+    @classmethod
+    def from_rooms(cls, maze_layout, finish=None):
+        """
+        Builds a grid from a maze_layout list of Room objects (as made by index_to_rooms)
+        :param maze_layout: Nested list of Room objects
+        :param finish: (x, y) of the exit, if the maze has one
+        :return: MazeGrid of door masks
+        """
+        return cls(np.array([[room.mask for room in row] for row in maze_layout], dtype=np.uint8), finish)
+
+    @property
+    def width(self):
+        return self.masks.shape[1]
+
+    @property
+    def height(self):
+        return self.masks.shape[0]
+
+    def door_mask(self, x, y):
+        """
+        Door mask of a single room
+        :param x: Column of the room
+        :param y: Row of the room
+        :return: Integer with North=1, East=2, South=4, West=8 bits set for each opening
+        """
+        return self.masks.item(y, x)
+
+    def region(self, x_start, y_start, x_stop, y_stop):
+        """
+        Door masks of a rectangle of rooms
+        :return: (y_stop - y_start, x_stop - x_start) uint8 view of the grid
+        """
+        return self.masks[y_start:y_stop, x_start:x_stop]
+
+    def room(self, x, y):
+        """
+        Room object matching a cell, shared with every other cell of the same room code
+        :param x: Column of the room
+        :param y: Row of the room
+        :return: Room object from ROOMS
+        """
+        return ROOMS[_lookup_tables()[1][self.masks[y, x]]]
+
+    def to_indexes(self):
+        """
+        Converts the grid back to room codes
+        :return: (height, width) uint8 array of room codes
+        """
+        return _lookup_tables()[1][self.masks]
@@ -0,0 +1,36 @@
+"""
+Deferred imports for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+NumPy takes over 100 ms to import, several times longer than everything else the game loads, so the game
+modules only import it when a function first needs it
+LazyModule: stands in for a module and imports it on first attribute use
+preload: imports modules on a background thread, e.g. while the player types their name
+"""
+
+import importlib
+import threading
+
+
+class LazyModule:
+
+    def __init__(self, name):
+        self._name = name  # module imported on first use, e.g. 'numpy'
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'>"
+
+    def __getattr__(self, attribute):
+        # Only called for names not copied yet; importlib's module locks make this safe across threads
+        module = importlib.import_module(self._name)
+        self.__dict__.update(vars(module))
+        return getattr(module, attribute)
+
+
+def preload(*names):
+    """
+    Imports modules on a daemon thread so they are ready by the time they are used
+    :param names: Module names, e.g. 'numpy'
+    :return: The started Thread
+    """
+    thread = threading.Thread(target=lambda: [importlib.import_module(name) for name in names], daemon=True)
+    thread.start()
+    return thread
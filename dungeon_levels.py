@@ -0,0 +1,356 @@
+"""
+Multi-level dungeons for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+Instead of winning at the exit, a player who has defeated every enemy of a level moves onto the stairs down to a
+new random maze, and can climb back up from the start room (0, 0) with the 'u' command
+DungeonEngine: GameEngine that descends through levels instead of ending at the first exit; close it (or use it as
+a context manager) to remove the levels it wrote to disk
+Level: one level's maze, enemies (with their spatial index), and explored rooms, packable to bytes
+LevelCache: keeps the most recently visited levels in memory, writes older ones to disk, and generates new ones
+from their per-level seed on demand, so memory stays flat however deep the player goes
+generate_level / level_seed: builds a level from the dungeon seed and its depth alone
+player_seed: seed of the player's own dice, independent of every level's
+Play a dungeon with DUNGEON_LEVELS=1 python bv_dungeon_game.py or python dungeon_server.py --levels.
+"""
+
+from collections import OrderedDict
+import os
+import shutil
+import struct
+import tempfile
+import weakref
+
+import numpy as np
+
+import dungeon_classes as dc
+import dungeon_engine as de
+import dungeon_fog as dfog
+import dungeon_functions as dfunc
+import dungeon_grid as dg
+import dungeon_paths as dpaths
+import dungeon_spatial as dspatial
+
+
+# Level.to_bytes layout (little-endian): depth, width, height (uint32), stairs x, y (int32, -1 for none), enemies,
+# explored map bytes (uint32), then the door masks (uint8, rows top to bottom), one ENEMY_RECORD per enemy, and the
+# ExploredMap.to_bytes blob
+LEVEL = struct.Struct('<IIIiiII')
+ENEMY_RECORD = np.dtype([('name', '<U64'), ('stats', 'i1', 6), ('HP', '<i2'), ('x', '<i4'), ('y', '<i4'),
+                         ('defeated', 'i1')])
+
+# DungeonEngine.snapshot_extra layout (little-endian): depth, maze size, enemy count, levels in memory, other levels
+# (uint32), seed bytes (uint8), then the unsigned seed and each other level as its byte count (uint32) and
+# Level.to_bytes
+DUNGEON = struct.Struct('<IIIIIB')
+LEVEL_BYTES = struct.Struct('<I')
+
+
+class Level:
+
+    def __init__(self, depth, maze, enemies, explored=None):
+        self.depth = depth  # 0 for the first level
+        self.maze = maze  # MazeGrid with the stairs down at maze.finish
+        self.enemies = enemies
+        self.index = dspatial.SpatialIndex.from_combatants(enemies)  # enemies by room, ids are list positions
+        self.explored = explored if explored is not None else dfog.ExploredMap(maze)  # rooms the player entered
+
+    def __str__(self):
+        return f"Level {self.depth + 1}: {self.maze} with {sum(not enemy.defeated for enemy in self.enemies)} " \
+               f"of {len(self.enemies)} enemies left."
+
+    def to_bytes(self):
+        """
+        Packs the level into a binary blob
+        :return: bytes
+        """
+        maze = self.maze
+        stairs_x, stairs_y = maze.finish if maze.finish is not None else (-1, -1)
+        records = np.array([(enemy.name, enemy.stats, enemy.HP, enemy.x_location, enemy.y_location, enemy.defeated)
+                            for enemy in self.enemies], dtype=ENEMY_RECORD)
+        explored = self.explored.to_bytes()
+        return b''.join([LEVEL.pack(self.depth, maze.width, maze.height, stairs_x, stairs_y, len(records),
+                                    len(explored)), maze.masks.tobytes(), records.tobytes(), explored])
+
+    @classmethod
+    def from_bytes(cls, blob):
+        """
+        Unpacks a blob from to_bytes
+        :param blob: bytes
+        :return: Level
+        """
+        depth, width, height, stairs_x, stairs_y, count, explored_bytes = LEVEL.unpack_from(blob)
+        offset = LEVEL.size
+        masks = np.frombuffer(blob, dtype=np.uint8, count=width * height, offset=offset).reshape(height, width)
+        maze = dg.MazeGrid(masks.copy(), (stairs_x, stairs_y) if stairs_x >= 0 else None)
+        offset += masks.nbytes
+        enemies = []
+        for name, stats, hp, x, y, defeated in np.frombuffer(blob, dtype=ENEMY_RECORD, count=count,
+                                                             offset=offset).tolist():
+            enemy = dc.Combatant(name, list(stats), x, y, defeated)
+            enemy.HP = hp
+            enemies.append(enemy)
+        offset += count * ENEMY_RECORD.itemsize
+        explored = dfog.ExploredMap.from_bytes(blob[offset:offset + explored_bytes], maze)
+        return cls(depth, maze, enemies, explored)
+
+
+def level_seed(seed, depth):
+    """
+    :param seed: int seed of the whole dungeon
+    :param depth: Level number, 0 for the first level
+    :return: SeedSequence of that level, independent of every other level's
+    """
+    return np.random.SeedSequence([seed, depth])
+
+
+def player_seed(seed):
+    """
+    :param seed: int seed of the whole dungeon
+    :return: SeedSequence of the player's dice (stats, fights, and rests), apart from every level_seed
+    """
+    # SeedSequence(seed) would pad its entropy to the same pool as level_seed(seed, 0), so it gets its own spawn key
+    return np.random.SeedSequence(seed, spawn_key=(0,))
+
+
+def generate_level(seed, depth, maze_size=32, enemy_count=3):
+    """
+    Builds a level the way GameEngine.new_game builds a random maze game, rolling from the level's own seed
+    :param seed: int seed of the whole dungeon
+    :param depth: Level number
+    :param maze_size: Side of the level's random_maze
+    :param enemy_count: Number of enemies on the level
+    :return: Level
+    """
+    pool = dc.DicePool(level_seed(seed, depth))
+    d6 = dc.Die(6, pool)
+    enemies = [dc.Combatant(de.enemy_name(i), d6.stats_rolls()) for i in range(enemy_count)]
+    maze = dg.MazeGrid.from_indexes(dfunc.random_maze(maze_size, pool.generator, as_array=True))
+    maze.finish = dpaths.paths_for(maze).farthest_from(0, 0)
+    dfunc.spawn_enemies(enemies, None, maze, pool.generator)
+    return Level(depth, maze, enemies)
+
+
+class LevelCache:
+
+    def __init__(self, seed, maze_size=32, enemy_count=3, max_levels=4, directory=None):
+        """
+        :param seed: int seed of the whole dungeon
+        :param maze_size: Side of each level's random_maze
+        :param enemy_count: Number of enemies on each level
+        :param max_levels: Number of levels kept in memory
+        :param directory: Where evicted levels are written (defaults to a temporary directory removed by close, or
+                          once the cache is garbage collected)
+        """
+        self.seed = seed
+        self.maze_size = maze_size
+        self.enemy_count = enemy_count
+        self.max_levels = max_levels
+        self.directory = tempfile.mkdtemp(prefix='bvd_levels_') if directory is None else directory
+        self._levels = OrderedDict()  # depth -> Level, least recently used first
+        self._evicted = set()  # depths written to disk
+        # Removes the cache's own temporary directory on close, garbage collection, or interpreter exit
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.directory, ignore_errors=True) \
+            if directory is None else None
+
+    def __len__(self):
+        return len(self._levels)
+
+    def __str__(self):
+        return f"{len(self._levels)} levels in memory and {len(self._evicted)} on disk in {self.directory}."
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, depth):
+        """
+        Level at a depth: from memory, reloaded from disk, or generated the first time it is reached
+        :param depth: Level number
+        :return: Level
+        """
+        level = self._levels.get(depth)
+        if level is not None:
+            self._levels.move_to_end(depth)
+            return level
+        level = self._load(depth) if depth in self._evicted else \
+            generate_level(self.seed, depth, self.maze_size, self.enemy_count)
+        self.add(level)
+        return level
+
+    def add(self, level):
+        """
+        Puts a level in memory as the most recently used one, writing the least recently used to disk if needed
+        :param level: Level
+        :return: N/A
+        """
+        self._levels[level.depth] = level
+        self._levels.move_to_end(level.depth)
+        while len(self._levels) > self.max_levels:
+            self._save(self._levels.popitem(last=False)[1])
+
+    def packed_levels(self, skip=None):
+        """
+        Every level reached so far, packed, without loading evicted ones back into memory
+        :param skip: Depth to leave out, e.g. the one being played
+        :return: Iterator of (depth, Level.to_bytes blob), shallowest first
+        """
+        for depth in sorted(self._evicted.union(self._levels)):
+            level = self._levels.get(depth)
+            if depth == skip:
+                continue
+            if level is not None:
+                yield depth, level.to_bytes()
+            else:
+                with open(self._path(depth), 'rb') as file:
+                    yield depth, file.read()
+
+    def add_packed(self, depth, blob):
+        """
+        Adds a level packed by Level.to_bytes straight to disk, to be loaded when it is next reached
+        :param depth: Level number
+        :param blob: bytes
+        :return: N/A
+        """
+        self._levels.pop(depth, None)
+        self._write(depth, blob)
+
+    def _path(self, depth):
+        return os.path.join(self.directory, f'level_{depth}.bvdl')
+
+    def _save(self, level):
+        self._write(level.depth, level.to_bytes())
+
+    def _write(self, depth, blob):
+        with open(self._path(depth), 'wb') as file:
+            file.write(blob)
+        self._evicted.add(depth)
+
+    def _load(self, depth):
+        with open(self._path(depth), 'rb') as file:
+            return Level.from_bytes(file.read())
+
+    def close(self):
+        """
+        Removes the evicted levels if they are in the cache's own temporary directory
+        :return: N/A
+        """
+        if self._cleanup is not None:
+            self._cleanup()
+
+
+class DungeonEngine(de.GameEngine):
+
+    @classmethod
+    def new_game(cls, player_name, seed=None, enemy_count=3, maze_size=32, pool=None, max_levels=4,
+                 cache_dir=None):
+        """
+        Creates a new dungeon; the first level is generate_level(seed, 0) and the player rolls from player_seed
+        :param seed: int seed or SeedSequence of the whole dungeon (picked at random when None)
+        :param maze_size: Side of each level's random_maze
+        :param pool: DicePool for the player's dice instead of one made from player_seed
+        :param max_levels: Number of levels kept in memory
+        :param cache_dir: Where evicted levels are written (defaults to a temporary directory)
+        (other parameters as in GameEngine.new_game)
+        :return: DungeonEngine on level 1
+        """
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        elif isinstance(seed, np.random.SeedSequence):
+            seed = int.from_bytes(seed.generate_state(4).tobytes(), 'little')
+        pool = pool if pool is not None else dc.DicePool(player_seed(seed))
+        player = dc.Player(player_name, dc.Die(6, pool).stats_rolls())
+        levels = LevelCache(seed, maze_size, enemy_count, max_levels, cache_dir)
+        first = levels.get(0)
+        engine = cls(first.maze, player, first.enemies, dc.Die(20, pool), dc.Die(8, pool), None)
+        engine.levels = levels
+        engine._enter(0, (0, 0))
+        return engine
+
+    def __str__(self):
+        return f"{self.player.name} at ({self.player.x_location}, {self.player.y_location}) " \
+               f"on level {self.depth + 1}, {self.mode} mode."
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Removes the levels written to the cache's own temporary directory
+        :return: N/A
+        """
+        self.levels.close()
+
+    def snapshot_extra(self):
+        """
+        Packs the dungeon settings and every other level reached, so a restored engine gets its own LevelCache
+        :return: bytes
+        """
+        levels = self.levels
+        seed = levels.seed.to_bytes(max(1, (levels.seed.bit_length() + 7) // 8), 'little')
+        others = list(levels.packed_levels(skip=self.depth))
+        parts = [DUNGEON.pack(self.depth, levels.maze_size, levels.enemy_count, levels.max_levels, len(others),
+                              len(seed)), seed]
+        for _, blob in others:
+            parts += [LEVEL_BYTES.pack(len(blob)), blob]
+        return b''.join(parts)
+
+    def restore_extra(self, extra):
+        """
+        Rebuilds the LevelCache in a new temporary directory, with the snapshot's maze as the current level
+        :param extra: bytes from snapshot_extra
+        :return: N/A
+        """
+        depth, maze_size, enemy_count, max_levels, count, seed_bytes = DUNGEON.unpack_from(extra)
+        offset = DUNGEON.size
+        seed = int.from_bytes(extra[offset:offset + seed_bytes], 'little')
+        offset += seed_bytes
+        self.levels = LevelCache(seed, maze_size, enemy_count, max_levels)
+        for _ in range(count):
+            (size,) = LEVEL_BYTES.unpack_from(extra, offset)
+            offset += LEVEL_BYTES.size
+            blob = extra[offset:offset + size]
+            offset += size
+            self.levels.add_packed(LEVEL.unpack_from(blob)[0], blob)
+        level = Level(depth, self.maze, self.enemies, self.explored)
+        self.levels.add(level)
+        self.depth = depth
+        self.index = level.index
+
+    def _explore(self, command, direction, events):
+        player = self.player
+        if command == 'u':
+            if not self.depth or (player.x_location, player.y_location) != (0, 0):
+                events.append(de.Event('no_stairs', player.name))
+                return
+            # Back up the stairs, arriving on the previous level's stairs down; only a move onto them descends again
+            self._enter(self.depth - 1, self.levels.get(self.depth - 1).maze.finish)
+            events.append(de.Event('ascend', player.name, value=self.depth))
+            return
+        super()._explore(command, direction, events)
+
+    def _reach_exit(self, events):
+        if not all(enemy.defeated for enemy in self.enemies):
+            return super()._reach_exit(events)
+        if not any(event.kind == 'moved' for event in events):
+            return False
+        self._enter(self.depth + 1, (0, 0))
+        events.append(de.Event('descend', self.player.name, value=self.depth))
+        return True
+
+    def _enter(self, depth, location):
+        """
+        Moves the player to another level
+        :param depth: Level number
+        :param location: (x, y) the player arrives at
+        :return: N/A
+        """
+        level = self.levels.get(depth)
+        self.depth = depth
+        self.maze, self.enemies, self.index, self.explored = level.maze, level.enemies, level.index, level.explored
+        self.player.x_location, self.player.y_location = location
+        self.last_location = [location[1], location[0]]
+        self.explored.reveal(*location)
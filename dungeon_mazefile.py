@@ -0,0 +1,185 @@
+"""
+On-disk mazes for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+File layout (little-endian):
+    64 byte header: magic b'BVDMAZE\\0', format version (uint16), tile size (uint16), width (uint32),
+                    height (uint32), finish x (int32), finish y (int32), then zero padding
+    tiles: tile size x tile size uint8 room codes, tiles stored row by row, edge tiles padded with closed rooms (0)
+save_maze: writes a maze (MazeGrid or index format) to a maze file
+save_maze_rows: writes a maze given one row at a time (e.g. from random_maze_rows), holding one band of tiles
+in memory
+open_maze: opens a maze file through numpy.memmap without reading it
+TiledMaze: maze backed by the memory-mapped file, loading only the tiles that are used,
+usable directly by Player.move, look_room, and the GameEngine
+"""
+
+from collections import OrderedDict
+import struct
+
+import numpy as np
+
+import dungeon_grid as dg
+
+
+MAGIC = b'BVDMAZE\0'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sHHIIii')
+HEADER_SIZE = 64
+
+
+def _tile_counts(width, height, tile_size):
+    return -(-height // tile_size), -(-width // tile_size)
+
+
+def save_maze(path, maze, finish=None, tile_size=64):
+    """
+    Writes a maze to a maze file
+    :param path: File to write
+    :param maze: MazeGrid, or maze in index format (nested lists or array of room codes)
+    :param finish: (x, y) of the exit (defaults to the MazeGrid's finish)
+    :param tile_size: Side of the square tiles the maze is stored in
+    :return: N/A
+    """
+    if isinstance(maze, dg.MazeGrid):
+        finish = maze.finish if finish is None else finish
+        maze = maze.to_indexes()
+    codes = np.asarray(maze, dtype=np.uint8)
+    save_maze_rows(path, codes, codes.shape[1], finish, tile_size)
+
+
+def save_maze_rows(path, rows, width, finish=None, tile_size=64):
+    """
+    Writes a maze to a maze file as its rows arrive; only tile_size rows are held at a time, so memory grows
+    with the width of the maze but not its height, e.g.
+    save_maze_rows('huge.maze', dfunc.random_maze_rows(4096, 1_000_000, seed=0), 4096)
+    :param path: File to write
+    :param rows: Iterable of rows of room codes from the top down, each width long
+    :param width: Number of rooms in each row
+    :param finish: (x, y) of the exit, if the maze has one
+    :param tile_size: Side of the square tiles the maze is stored in
+    :return: Height of the maze written
+    """
+    tiles_x = _tile_counts(width, 0, tile_size)[1]
+    band = np.zeros((tile_size, tiles_x * tile_size), dtype=np.uint8)  # one row of tiles, padded with closed rooms
+    finish_x, finish_y = finish if finish is not None else (-1, -1)
+    height = 0
+
+    def write_band():
+        # Row-major rooms of the band -> its tiles one after another
+        file.write(band.reshape(tile_size, tiles_x, tile_size).transpose(1, 0, 2).tobytes())
+        band.fill(0)
+
+    with open(path, 'wb') as file:
+        file.seek(HEADER_SIZE)  # the header is written last, once the height is known
+        for row in rows:
+            band[height % tile_size, :width] = row
+            height += 1
+            if height % tile_size == 0:
+                write_band()
+        if height % tile_size:
+            write_band()
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, tile_size, width, height, finish_x, finish_y)
+                   .ljust(HEADER_SIZE, b'\0'))
+    return height
+
+
+def open_maze(path, max_tiles=256):
+    """
+    Opens a maze file without reading its rooms, which are loaded tile by tile as they are used
+    :param path: Maze file written by save_maze
+    :param max_tiles: Number of decoded tiles kept in memory
+    :return: TiledMaze
+    """
+    with open(path, 'rb') as file:
+        header = file.read(HEADER_SIZE)
+    magic, version, tile_size, width, height, finish_x, finish_y = HEADER.unpack_from(header)
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a maze file.')
+    if version != FORMAT_VERSION:
+        raise ValueError(f'{path} uses maze file version {version}, expected {FORMAT_VERSION}.')
+
+    tiles = np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER_SIZE,
+                      shape=_tile_counts(width, height, tile_size) + (tile_size, tile_size))
+    finish = (finish_x, finish_y) if finish_x >= 0 else None
+    return TiledMaze(tiles, width, height, finish, max_tiles)
+
+
+class TiledMaze:
+
+    def __init__(self, tiles, width, height, finish=None, max_tiles=256):
+        self.tiles = tiles  # (tiles_y, tiles_x, tile_size, tile_size) memmap of room codes
+        self.width = width
+        self.height = height
+        self.finish = finish  # (x, y) of the exit, if the maze has one
+        self.tile_size = tiles.shape[2]
+        self.max_tiles = max_tiles
+        self._loaded = OrderedDict()  # (tile_y, tile_x) -> door masks of that tile, least recently used first
+        self._last_key = None
+        self._last_tile = None
+
+    def __str__(self):
+        return f"A {self.width}x{self.height} maze in {self.tile_size}x{self.tile_size} tiles, " \
+               f"{len(self._loaded)} loaded."
+
+    def tile(self, tile_x, tile_y):
+        """
+        Door masks of one tile, read from the file the first time it is used
+        :param tile_x: Column of the tile
+        :param tile_y: Row of the tile
+        :return: (tile_size, tile_size) uint8 array of door masks
+        """
+        key = (tile_y, tile_x)
+        masks = self._loaded.get(key)
+        if masks is None:
+            masks = self._loaded[key] = dg.ROOM_MASKS[self.tiles[tile_y, tile_x]]
+            if len(self._loaded) > self.max_tiles:
+                self._loaded.popitem(last=False)
+        else:
+            self._loaded.move_to_end(key)
+        self._last_key, self._last_tile = key, masks
+        return masks
+
+    def door_mask(self, x, y):
+        """
+        Door mask of a single room
+        :param x: Column of the room
+        :param y: Row of the room
+        :return: Integer with North=1, East=2, South=4, West=8 bits set for each opening
+        """
+        size = self.tile_size
+        key = (y // size, x // size)
+        masks = self._last_tile if key == self._last_key else self.tile(key[1], key[0])
+        return masks.item(y % size, x % size)
+
+    def room(self, x, y):
+        """
+        Room object matching a cell, shared with every other cell of the same room code
+        :param x: Column of the room
+        :param y: Row of the room
+        :return: Room object from ROOMS
+        """
+        return dg.ROOMS[dg.MASK_ROOMS[self.door_mask(x, y)]]
+
+    def region(self, x_start, y_start, x_stop, y_stop):
+        """
+        Door masks of a rectangle of rooms, loading only the tiles it covers
+        :return: (y_stop - y_start, x_stop - x_start) uint8 array of door masks
+        """
+        size = self.tile_size
+        masks = np.empty((y_stop - y_start, x_stop - x_start), dtype=np.uint8)
+        for tile_y in range(y_start // size, (y_stop - 1) // size + 1):
+            for tile_x in range(x_start // size, (x_stop - 1) // size + 1):
+                top, left = tile_y * size, tile_x * size
+                rows = slice(max(y_start, top), min(y_stop, top + size))
+                columns = slice(max(x_start, left), min(x_stop, left + size))
+                tile = self.tile(tile_x, tile_y)
+                masks[rows.start - y_start:rows.stop - y_start, columns.start - x_start:columns.stop - x_start] = \
+                    tile[rows.start - top:rows.stop - top, columns.start - left:columns.stop - left]
+        return masks
+
+    def to_grid(self):
+        """
+        Loads the whole maze into memory
+        :return: MazeGrid
+        """
+        return dg.MazeGrid(self.region(0, 0, self.width, self.height), self.finish)
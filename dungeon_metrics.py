@@ -0,0 +1,216 @@
+"""
+Instrumentation for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+Counts turns, moves, wall bumps, fights, attacks, hits, crits, rests, and mazes, and times turns, the legacy
+move_loop / fight_loop / attack_target / rest functions, the engine's attacks and rests, and maze generation
+Collector: in-process store of counters and timing spans, exported with write (JSON or CSV)
+enable / disable: install or remove the hooks; while disabled the game runs its original functions untouched,
+so instrumentation costs nothing unless it is switched on
+span: times any block of code into the active collector
+The command line game enables it when the DUNGEON_METRICS environment variable names an output file.
+"""
+
+import contextlib
+import csv
+import functools
+import json
+import time
+
+import dungeon_classes as dc
+import dungeon_engine as de
+import dungeon_functions as dfunc
+
+
+collector = None  # active Collector, None while disabled
+_originals = []  # (owner, attribute, original function) of every installed hook
+
+
+class Collector:
+
+    def __init__(self):
+        self.counters = {}  # name -> count
+        self.spans = {}  # name -> [calls, total seconds, shortest, longest]
+        self.started = time.time()
+
+    def __str__(self):
+        return f"{sum(self.counters.values())} counts in {len(self.counters)} counters, " \
+               f"{sum(span[0] for span in self.spans.values())} timed calls in {len(self.spans)} spans."
+
+    def count(self, name, amount=1):
+        """
+        Adds to a counter
+        :param name: Counter name, e.g. 'moves'
+        :param amount: Amount to add
+        :return: N/A
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_span(self, name, seconds):
+        """
+        Records one timed call
+        :param name: Span name, e.g. 'turn'
+        :param seconds: Duration of the call
+        :return: N/A
+        """
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [1, seconds, seconds, seconds]
+        else:
+            span[0] += 1
+            span[1] += seconds
+            if seconds < span[2]:
+                span[2] = seconds
+            elif seconds > span[3]:
+                span[3] = seconds
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """
+        Times the block of a with statement
+        :param name: Span name
+        :return: Context manager
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def reset(self):
+        self.counters.clear()
+        self.spans.clear()
+        self.started = time.time()
+
+    def to_dict(self):
+        """
+        :return: JSON-ready dictionary of counters and spans (calls, total, mean, min, and max seconds)
+        """
+        return {'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'counters': dict(self.counters),
+                'spans': {name: {'calls': calls, 'total': total, 'mean': total / calls,
+                                 'min': shortest, 'max': longest}
+                          for name, (calls, total, shortest, longest) in self.spans.items()}}
+
+    def write(self, path):
+        """
+        Writes counters and spans to a .csv file (one row each) or, for any other extension, a JSON file
+        :param path: Output file
+        :return: N/A
+        """
+        data = self.to_dict()
+        with open(path, 'w', newline='') as file:
+            if path.lower().endswith('.csv'):
+                writer = csv.writer(file)
+                writer.writerow(['kind', 'name', 'count', 'total', 'mean', 'min', 'max'])
+                for name, count in data['counters'].items():
+                    writer.writerow(['counter', name, count, '', '', '', ''])
+                for name, span in data['spans'].items():
+                    writer.writerow(['span', name, span['calls'], span['total'], span['mean'], span['min'],
+                                     span['max']])
+            else:
+                json.dump(data, file, indent=2)
+
+
+def _timed(function, name, counter=None):
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        if counter:
+            collector.count(counter)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            collector.add_span(name, time.perf_counter() - start)
+    return timed
+
+
+def _counted_step(step):
+    @functools.wraps(step)
+    def counted_step(engine, command, direction=None):
+        start = time.perf_counter()
+        events = step(engine, command, direction)
+        collector.add_span('turn', time.perf_counter() - start)
+        collector.count('turns')
+        for event in events:
+            if event.kind in ('encounter', 'ambush'):
+                collector.count('fights')
+        return events
+    return counted_step
+
+
+def _counted_move(try_move):
+    @functools.wraps(try_move)
+    def counted_move(player, direction, maze_layout):
+        moved = try_move(player, direction, maze_layout)
+        if moved:
+            collector.count('moves')
+        elif direction in dc.DOOR_BITS:
+            collector.count('wall_bumps')
+        return moved
+    return counted_move
+
+
+def _counted_attack(attack):
+    @functools.wraps(attack)
+    def counted_attack(attacker, d20_roll, enemy):
+        hit = attack(attacker, d20_roll, enemy)
+        collector.count('attacks')
+        if hit:
+            collector.count('crits' if hit == 2 else 'hits')
+        return hit
+    return counted_attack
+
+
+def _hooks():
+    """
+    :return: List of (owner, attribute, wrapper factory) for every instrumented function
+    """
+    return [(de.GameEngine, 'step', _counted_step),
+            (de.GameEngine, '_attack', lambda f: _timed(f, 'GameEngine._attack')),
+            (de.GameEngine, '_rest', lambda f: _timed(f, 'GameEngine._rest', 'rests')),
+            (dc.Player, 'try_move', _counted_move),
+            (dc.Combatant, 'attack', _counted_attack),
+            (dfunc, 'move_loop', lambda f: _timed(f, 'move_loop')),
+            (dfunc, 'fight_loop', lambda f: _timed(f, 'fight_loop', 'fights')),
+            (dfunc, 'attack_target', lambda f: _timed(f, 'attack_target')),
+            (dfunc, 'rest', lambda f: _timed(f, 'rest', 'rests')),
+            (dfunc, 'random_maze', lambda f: _timed(f, 'random_maze', 'mazes')),
+            (dfunc, 'maze_initialization', lambda f: _timed(f, 'maze_initialization', 'mazes')),
+            ]
+
+
+def enable(new_collector=None):
+    """
+    Starts recording, installing the hooks if they aren't installed yet
+    :param new_collector: Collector to record into (defaults to a new one)
+    :return: The active Collector
+    """
+    global collector
+    collector = new_collector if new_collector is not None else Collector()
+    if not _originals:
+        for owner, attribute, wrap in _hooks():
+            original = getattr(owner, attribute)
+            _originals.append((owner, attribute, original))
+            setattr(owner, attribute, wrap(original))
+    return collector
+
+
+def disable():
+    """
+    Stops recording and puts the original functions back
+    :return: The Collector that was active (None if instrumentation was already off)
+    """
+    global collector
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        setattr(owner, attribute, original)
+    stopped, collector = collector, None
+    return stopped
+
+
+def span(name):
+    """
+    Times the block of a with statement into the active collector, if any
+    :param name: Span name
+    :return: Context manager
+    """
+    return collector.span(name) if collector is not None else contextlib.nullcontext()
@@ -0,0 +1,250 @@
+"""
+Pathfinding over the maze door graph for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+A move is allowed when the current room has a door that way and the next room is inside the maze,
+matching Player.move
+MazePaths: BFS distance fields, connected components, and shortest paths for one maze, computed once and cached
+paths_for: returns the cached MazePaths of a MazeGrid
+"""
+
+from collections import OrderedDict
+import weakref
+
+import dungeon_classes as dc
+import dungeon_grid as dg
+import dungeon_lazy as dlazy
+
+np = dlazy.LazyModule('numpy')
+
+
+UNREACHABLE = -1
+
+_paths_cache = weakref.WeakKeyDictionary()
+
+
+class MazePaths:
+
+    def __init__(self, maze, max_fields=8):
+        """
+        :param maze: MazeGrid, TiledMaze (read whole, as every room can be on a path), nested list of Room objects,
+                     or maze in index format
+        :param max_fields: Number of distance fields kept in the cache
+        """
+        if isinstance(maze, dg.MazeGrid):
+            self.finish = maze.finish
+        elif hasattr(maze, 'to_grid'):
+            maze = maze.to_grid()
+            self.finish = maze.finish
+        elif isinstance(maze, list) and isinstance(maze[0][0], dc.Room):
+            maze = dg.MazeGrid.from_rooms(maze)
+            self.finish = None
+        else:
+            maze = dg.MazeGrid.from_indexes(maze)
+            self.finish = None
+
+        self.height, self.width = maze.masks.shape
+        self.max_fields = max_fields
+        self._fields = OrderedDict()  # (x, y, reverse) -> flat distance field
+        self._components = None
+
+        # Flat indexes of the rooms each move can be made from, for north, east, south, and west moves
+        masks = maze.masks
+        self._moves = []
+        for bit, (x_step, y_step) in zip((dc.NORTH, dc.EAST, dc.SOUTH, dc.WEST), dc.STEPS.values()):
+            allowed = (masks & bit) > 0
+            if y_step:
+                allowed[0 if y_step < 0 else -1, :] = False
+            if x_step:
+                allowed[:, 0 if x_step < 0 else -1] = False
+            self._moves.append((allowed.ravel(), y_step * self.width + x_step))
+
+    def __str__(self):
+        return f"Paths for a {self.width}x{self.height} maze with {len(self._fields)} cached distance fields."
+
+    def _distance_field(self, x, y, reverse):
+        key = (x, y, reverse)
+        field = self._fields.get(key)
+        if field is not None:
+            self._fields.move_to_end(key)
+            return field
+
+        field = np.full(self.width * self.height, UNREACHABLE, dtype=np.int32)
+        frontier = np.array([y * self.width + x])
+        field[frontier] = 0
+        distance = 0
+
+        # Breadth first search one whole frontier at a time
+        while frontier.size:
+            distance += 1
+            found = []
+            for allowed, offset in self._moves:
+                if reverse:
+                    # rooms that can step into the frontier
+                    rooms = frontier - offset
+                    rooms = rooms[(rooms >= 0) & (rooms < field.size)]
+                    rooms = rooms[allowed[rooms]]
+                else:
+                    # rooms the frontier can step into
+                    rooms = frontier[allowed[frontier]] + offset
+                found.append(rooms[field[rooms] == UNREACHABLE])
+            frontier = np.unique(np.concatenate(found))
+            field[frontier] = distance
+
+        # Cached fields are shared by every caller of paths_for, so one caller's write can't corrupt another's routes
+        field.setflags(write=False)
+        self._fields[key] = field
+        if len(self._fields) > self.max_fields:
+            self._fields.popitem(last=False)
+        return field
+
+    def distances_from(self, x, y):
+        """
+        Number of moves needed to reach every room starting at (x, y)
+        :param x: Column of the starting room
+        :param y: Row of the starting room
+        :return: Read-only (height, width) int32 array, UNREACHABLE where a room can't be reached
+        """
+        return self._distance_field(x, y, False).reshape(self.height, self.width)
+
+    def distances_to(self, x, y):
+        """
+        Number of moves needed to reach (x, y) starting from every room
+        :param x: Column of the target room
+        :param y: Row of the target room
+        :return: Read-only (height, width) int32 array, UNREACHABLE where (x, y) can't be reached
+        """
+        return self._distance_field(x, y, True).reshape(self.height, self.width)
+
+    def exit_distances(self):
+        """
+        Number of moves needed to reach the maze's exit from every room
+        :return: Read-only (height, width) int32 array, UNREACHABLE where the exit can't be reached
+        """
+        return self.distances_to(*self.finish)
+
+    def components(self):
+        """
+        Labels rooms joined by doors (in either direction) with the same component number
+        :return: Read-only (height, width) int32 array of labels numbered from 0
+        """
+        if self._components is not None:
+            return self._components
+
+        # Every door is an edge between two flat room indexes
+        starts, ends = [], []
+        for allowed, offset in self._moves:
+            rooms = np.flatnonzero(allowed)
+            starts.append(rooms)
+            ends.append(rooms + offset)
+        starts, ends = np.concatenate(starts), np.concatenate(ends)
+
+        # Hook larger roots onto smaller ones, then flatten with pointer jumping until no edge joins two roots
+        labels = np.arange(self.width * self.height)
+        while True:
+            start_labels, end_labels = labels[starts], labels[ends]
+            joined = start_labels != end_labels
+            if not joined.any():
+                break
+            np.minimum.at(labels, np.maximum(start_labels, end_labels)[joined],
+                          np.minimum(start_labels, end_labels)[joined])
+            while True:
+                jumped = labels[labels]
+                if np.array_equal(jumped, labels):
+                    break
+                labels = jumped
+
+        components = np.unique(labels, return_inverse=True)[1].astype(np.int32).reshape(self.height, self.width)
+        components.setflags(write=False)
+        self._components = components
+        return components
+
+    def component_count(self):
+        """
+        :return: Number of separate regions in the maze (a closed room is a region of its own)
+        """
+        return int(self.components().max()) + 1
+
+    def reachable(self, start, goal):
+        """
+        Checks if goal can be reached from start
+        :param start: (x, y) of the starting room
+        :param goal: (x, y) of the target room
+        :return: True if a path exists
+        """
+        return self.distances_to(*goal)[start[1], start[0]] != UNREACHABLE
+
+    def next_step(self, start, goal):
+        """
+        First move of a shortest path from start to goal
+        :param start: (x, y) of the starting room
+        :param goal: (x, y) of the target room
+        :return: 'n', 'e', 's', or 'w', or None if already there or goal can't be reached
+        """
+        field = self._distance_field(goal[0], goal[1], True)
+        room = start[1] * self.width + start[0]
+        distance = field[room]
+        if distance <= 0:
+            return None
+
+        for direction, (allowed, offset) in zip(dc.STEPS, self._moves):
+            if allowed[room] and field[room + offset] == distance - 1:
+                return direction
+
+    def directions_to(self, x, y):
+        """
+        First move of a shortest path to (x, y) from every room at once, like next_step for each start
+        :param x: Column of the target room
+        :param y: Row of the target room
+        :return: (height, width) int8 array of indexes into 'nesw', -1 at the target and where it can't be reached
+        """
+        field = self._distance_field(x, y, True)
+        directions = np.full(field.size, -1, dtype=np.int8)
+        # Checked in reverse so the first matching direction wins, as in next_step
+        for index in range(len(self._moves) - 1, -1, -1):
+            allowed, offset = self._moves[index]
+            rooms = np.flatnonzero(allowed & (field > 0))
+            rooms = rooms[field[rooms + offset] == field[rooms] - 1]
+            directions[rooms] = index
+        return directions.reshape(self.height, self.width)
+
+    def shortest_path(self, start, goal):
+        """
+        Shortest list of rooms from start to goal
+        :param start: (x, y) of the starting room
+        :param goal: (x, y) of the target room
+        :return: List of (x, y) including both ends, or None if goal can't be reached
+        """
+        field = self._distance_field(goal[0], goal[1], True)
+        room = start[1] * self.width + start[0]
+        if field[room] == UNREACHABLE:
+            return None
+
+        path = [tuple(start)]
+        while field[room]:
+            for allowed, offset in self._moves:
+                if allowed[room] and field[room + offset] == field[room] - 1:
+                    room += offset
+                    break
+            path.append((room % self.width, room // self.width))
+        return path
+
+    def farthest_from(self, x, y):
+        """
+        Room reachable from (x, y) that takes the most moves to get to, e.g. an exit for random_maze output
+        :param x: Column of the starting room
+        :param y: Row of the starting room
+        :return: (x, y) of the farthest room
+        """
+        room = int(np.argmax(self._distance_field(x, y, False)))
+        return room % self.width, room // self.width
+
+
+def paths_for(maze):
+    """
+    Cached MazePaths of a MazeGrid (or TiledMaze), built the first time it is asked for
+    :param maze: MazeGrid or TiledMaze
+    :return: MazePaths shared by every caller using the same MazeGrid
+    """
+    paths = _paths_cache.get(maze)
+    if paths is None:
+        paths = _paths_cache[maze] = MazePaths(maze)
+    return paths
@@ -0,0 +1,163 @@
+"""
+Maze drawing for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+Uses Box Drawing unicode (u2500 - u257F), two characters per room
+ROOM_GLYPHS / MASK_GLYPHS: drawing of each room, by room code and by door mask
+MazeRenderer: draws a viewport around the player with player and enemy markers, caching encoded rows
+and reporting only the rows that changed since the last frame; with an ExploredMap (dungeon_fog.py) it draws
+only the rooms the player has seen, cropped to the explored region
+draw_changes: redraws changed rows in place on an ANSI terminal
+"""
+
+import sys
+
+import dungeon_grid as dg
+
+
+# NOTE: each character uses a space before the symbol
+ROOM_GLYPHS = [' \u2573',  # Closed room
+               ' \u253C',  # Open room
+               ' \u2502',  # NS corridor
+               ' \u2500',  # EW corridor
+               ' \u2518',  # NW corner
+               ' \u2514',  # NE corner
+               ' \u250C',  # SE corner
+               ' \u2510',  # SW corner
+               ' \u2534',  # EW with N tee
+               ' \u251C',  # NS with E tee
+               ' \u252C',  # EW with S tee
+               ' \u2524',  # NS with W tee
+               ' \u257D',  # N dead end
+               ' \u257E',  # E dead end
+               ' \u257F',  # S dead end
+               ' \u257C',  # W dead end
+               ]
+MASK_GLYPHS = [glyph for mask, glyph in sorted(zip((room.mask for room in dg.ROOMS), ROOM_GLYPHS))]
+
+UNSEEN_GLYPH = '  '
+PLAYER_MARKER = '@'
+ENEMY_MARKER = '!'
+DEFEATED_MARKER = 'x'
+
+
+class MazeRenderer:
+
+    def __init__(self, maze, columns=31, rows=15, explored=None):
+        """
+        :param maze: MazeGrid or TiledMaze to draw
+        :param columns: Width of the viewport in rooms
+        :param rows: Height of the viewport in rooms
+        :param explored: ExploredMap of the player, to draw only the rooms they have seen (None draws everything)
+        """
+        self.maze = maze
+        self.explored = explored
+        self._revision = None  # explored.revision the cached rows were drawn at
+        self.columns = min(columns, maze.width)
+        self.rows = min(rows, maze.height)
+        self._origin = None  # x, y of the viewport's top left room
+        self._left = None  # first column of the cached rows
+        self._encoded = {}  # maze row -> encoded string of the viewport's columns
+        self._frame = []  # lines of the last frame drawn
+
+    def __str__(self):
+        return f"A {self.columns}x{self.rows} room view of a {self.maze.width}x{self.maze.height} maze."
+
+    def viewport(self, x, y):
+        """
+        Top left room of the viewport showing (x, y)
+        The viewport only scrolls when the player comes within a quarter of its size of an edge,
+        so most moves leave it in place and only change the player's old and new rows.
+        :return: x, y of the viewport's top left room
+        """
+        left, top = self._origin if self._origin else (x - self.columns // 2, y - self.rows // 2)
+        x_margin, y_margin = self.columns // 4, self.rows // 4
+        if not left + x_margin <= x < left + self.columns - x_margin:
+            left = x - self.columns // 2
+        if not top + y_margin <= y < top + self.rows - y_margin:
+            top = y - self.rows // 2
+
+        left = min(max(left, 0), self.maze.width - self.columns)
+        top = min(max(top, 0), self.maze.height - self.rows)
+        self._origin = (left, top)
+        return left, top
+
+    def _encoded_row(self, y):
+        row = self._encoded.get(y)
+        if row is None:
+            masks = self.maze.region(self._left, y, self._left + self.columns, y + 1)[0].tolist()
+            if self.explored is None:
+                row = ''.join([MASK_GLYPHS[mask] for mask in masks])
+            else:
+                seen = self.explored.seen
+                row = ''.join([MASK_GLYPHS[mask] if seen(x, y) else UNSEEN_GLYPH
+                               for x, mask in enumerate(masks, self._left)])
+            self._encoded[y] = row
+        return row
+
+    def render(self, x, y, enemies=()):
+        """
+        Draws the viewport around a position
+        :param x: Column of the player
+        :param y: Row of the player
+        :param enemies: Combatant objects to mark (only those inside the viewport, and seen if exploring, are drawn)
+        :return: List of strings, one per row of the viewport (only the explored rows and columns with an ExploredMap)
+        """
+        left, top = self.viewport(x, y)
+        explored = self.explored
+        # Cached rows only hold the viewport's columns, so start over when it scrolls sideways or grows large,
+        # or when more of the maze has been seen
+        revision = None if explored is None else explored.revision
+        if left != self._left or len(self._encoded) > 4 * self.rows or revision != self._revision:
+            self._left = left
+            self._revision = revision
+            self._encoded.clear()
+
+        # Group markers by viewport row, player drawn last so it stays visible
+        markers = {}
+        for enemy in enemies:
+            column, row = enemy.x_location - left, enemy.y_location - top
+            if 0 <= column < self.columns and 0 <= row < self.rows and \
+                    (explored is None or explored.seen(enemy.x_location, enemy.y_location)):
+                markers.setdefault(row, []).append((column, DEFEATED_MARKER if enemy.defeated else ENEMY_MARKER))
+        markers.setdefault(y - top, []).append((x - left, PLAYER_MARKER))
+
+        # Rows and columns of the viewport to draw: all of them, or those inside the explored region
+        first_row, last_row, first_column, last_column = 0, self.rows - 1, 0, self.columns - 1
+        if explored is not None and explored.bounds is not None:
+            bounds_left, bounds_top, bounds_right, bounds_bottom = explored.bounds
+            first_row, last_row = max(first_row, bounds_top - top), min(last_row, bounds_bottom - top)
+            first_column, last_column = max(first_column, bounds_left - left), min(last_column, bounds_right - left)
+
+        lines = []
+        for row in range(first_row, last_row + 1):
+            line = self._encoded_row(top + row)
+            for column, marker in markers.get(row, ()):
+                line = line[:2 * column + 1] + marker + line[2 * column + 2:]
+            lines.append(line[2 * first_column:2 * last_column + 2])
+        return lines
+
+    def update(self, x, y, enemies=()):
+        """
+        Draws the viewport and compares it with the last frame
+        :param x: Column of the player
+        :param y: Row of the player
+        :param enemies: Combatant objects to mark
+        :return: List of (row number, line) for every viewport row that changed
+        """
+        lines = self.render(x, y, enemies)
+        changes = [(row, line) for row, line in enumerate(lines)
+                   if row >= len(self._frame) or self._frame[row] != line]
+        self._frame = lines
+        return changes
+
+
+def draw_changes(changes, top=1, stream=None):
+    """
+    Rewrites changed rows in place using ANSI cursor movement
+    :param changes: List of (row number, line) from MazeRenderer.update
+    :param top: Terminal line of the viewport's first row (1 based)
+    :param stream: File to write to (defaults to sys.stdout)
+    :return: UI output
+    """
+    stream = stream or sys.stdout
+    stream.write(''.join(f'\x1b[{top + row};1H{line}\x1b[K' for row, line in changes))
+    stream.flush()
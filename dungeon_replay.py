@@ -0,0 +1,246 @@
+"""
+Replay logs for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+A game is fully decided by its dice seed and its commands, so a log stores only those, one byte per command,
+plus a digest of the final game state to check a replay against
+RecordingEngine: GameEngine that records its seed and every command it is given into a ReplayLog; forks and
+saved snapshots of it carry a copy of the log and keep recording
+ReplayLog: seed, game settings, and encoded commands of one session; replays it headlessly and checks the result
+state_digest: hash of everything a snapshot of the game holds (maze, combatants, mode, dice state, and explored
+rooms)
+save_log / load_log: ReplayLog to and from a file
+replay_corpus: replays many logs, e.g. a regression corpus of recorded sessions
+main: command line entry point, e.g. python dungeon_replay.py sessions/*.bvdr
+The command line game records a session when the DUNGEON_REPLAY environment variable names an output file.
+
+Log layout (little-endian):
+    header: magic b'BVDR', format version (uint16), enemy count (uint16), maze size (int32, -1 for the built-in
+            mazes), commands (uint32), name bytes (uint32), seed bytes (uint8)
+    digest: 16 byte blake2b of the final state's snapshot (all zero if none was recorded)
+    seed: unsigned integer seed, little-endian
+    name: UTF-8 player name
+    commands: one byte each (see COMMANDS); 254 and 255 are followed by a length byte and the UTF-8 text of an
+              unrecognized command or move direction
+"""
+
+import argparse
+import hashlib
+import struct
+import sys
+import time
+
+import dungeon_engine as de
+import dungeon_lazy as dlazy
+
+# Only needed once a game is recorded or checked, so importing this module keeps the game's startup fast
+np = dlazy.LazyModule('numpy')
+dsnap = dlazy.LazyModule('dungeon_snapshot')
+
+
+MAGIC = b'BVDR'
+FORMAT_VERSION = 3  # 3: digests of snapshot format 3 blobs, which hold the explored map
+HEADER = struct.Struct('<4sHHiIIB')
+DIGEST_SIZE = 16
+
+# Byte code -> (command, direction) of every command the game understands
+COMMANDS = [('a', None), ('r', None), ('l', None), ('c', None), ('h', None), ('x', None),
+            ('m', 'n'), ('m', 'e'), ('m', 's'), ('m', 'w'), ('m', None)]
+OTHER_COMMAND = 254  # followed by the command text
+OTHER_DIRECTION = 255  # 'm' followed by the direction text
+
+_CODES = {command: code for code, command in enumerate(COMMANDS)}
+
+
+class RecordingEngine(de.GameEngine):
+
+    @classmethod
+    def new_game(cls, player_name, seed=None, enemy_count=3, maze_size=None, pool=None, maze_path=None):
+        """
+        Creates a new game like GameEngine.new_game and starts its log
+        :param seed: int seed, or None to pick one (recorded either way)
+        :param pool: Not supported, a recorded game always rolls from its own seeded DicePool
+        :param maze_path: Not supported, a log only replays built-in and random mazes
+        (other parameters as in GameEngine.new_game)
+        :return: RecordingEngine with an empty log
+        """
+        if pool is not None:
+            raise ValueError('A recorded game rolls from its own DicePool.')
+        if maze_path is not None:
+            raise ValueError('A recorded game plays a built-in or random maze, not a maze file.')
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        engine = super().new_game(player_name, seed, enemy_count, maze_size)
+        engine.log = ReplayLog(player_name, seed, enemy_count, maze_size)
+        return engine
+
+    def step(self, command, direction=None):
+        self.log.add(command, direction)
+        return super().step(command, direction)
+
+    def snapshot_extra(self):
+        # A fork or loaded save keeps recording onto its own copy of the log so far
+        return self.log.to_bytes()
+
+    def restore_extra(self, extra):
+        self.log = ReplayLog.from_bytes(extra)
+
+    def save_log(self, path):
+        """
+        Writes the log with a digest of the current state, which a replay must reach
+        :param path: File to write
+        :return: The ReplayLog
+        """
+        self.log.digest = state_digest(self)
+        save_log(path, self.log)
+        return self.log
+
+
+class ReplayLog:
+
+    def __init__(self, player_name, seed, enemy_count=3, maze_size=None, commands=b'', digest=None):
+        self.player_name = player_name
+        self.seed = seed  # int seed of the game's DicePool
+        self.enemy_count = enemy_count
+        self.maze_size = maze_size  # side of the random maze, None for the built-in mazes
+        self.commands = bytearray(commands)  # encoded commands, see COMMANDS
+        self.digest = digest  # state_digest of the game after the last command, if recorded
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __str__(self):
+        maze = 'the built-in mazes' if self.maze_size is None else f'a {self.maze_size}x{self.maze_size} maze'
+        return f"Replay log of {self.player_name} on {maze}, {len(self)} commands."
+
+    def __iter__(self):
+        """
+        Decodes the commands
+        :return: Iterator of (command, direction)
+        """
+        commands = self.commands
+        position = 0
+        while position < len(commands):
+            code = commands[position]
+            if code < len(COMMANDS):
+                yield COMMANDS[code]
+                position += 1
+            else:
+                length = commands[position + 1]
+                text = commands[position + 2:position + 2 + length].decode(errors='replace')
+                yield ('m', text) if code == OTHER_DIRECTION else (text, None)
+                position += 2 + length
+
+    def add(self, command, direction=None):
+        """
+        Appends a command; anything but a move ignores its direction, as GameEngine.step does
+        :param command: Command given to GameEngine.step
+        :param direction: Direction given with it
+        :return: N/A
+        """
+        if command != 'm':
+            direction = None
+        code = _CODES.get((command, direction))
+        if code is not None:
+            self.commands.append(code)
+        else:
+            # Unrecognized input still counts: a move in an unknown direction updates last_location
+            text = (direction if command == 'm' else command).encode()[:255]
+            self.commands += bytes([OTHER_DIRECTION if command == 'm' else OTHER_COMMAND, len(text)]) + text
+
+    def new_game(self):
+        """
+        :return: GameEngine at the start of the recorded game
+        """
+        return de.GameEngine.new_game(self.player_name, self.seed, self.enemy_count, self.maze_size)
+
+    def replay(self):
+        """
+        Runs every command headlessly
+        :return: GameEngine after the last command
+        """
+        engine = self.new_game()
+        step = engine.step
+        for command, direction in self:
+            step(command, direction)
+        return engine
+
+    def check(self):
+        """
+        Replays the log and compares the final state with the recorded digest
+        :return: True if the replay reached the recorded state
+        """
+        if self.digest is None:
+            raise ValueError('The log has no recorded digest to check against.')
+        return state_digest(self.replay()) == self.digest
+
+    def to_bytes(self):
+        name = self.player_name.encode()
+        seed = self.seed.to_bytes(max(1, (self.seed.bit_length() + 7) // 8), 'little')
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, self.enemy_count,
+                             -1 if self.maze_size is None else self.maze_size,
+                             len(self.commands), len(name), len(seed))
+        return b''.join([header, self.digest or bytes(DIGEST_SIZE), seed, name, self.commands])
+
+    @classmethod
+    def from_bytes(cls, blob):
+        if blob[:4] != MAGIC:
+            raise ValueError('Not a replay log.')
+        _, version, enemy_count, maze_size, command_bytes, name_bytes, seed_bytes = HEADER.unpack_from(blob)
+        if version != FORMAT_VERSION:
+            raise ValueError(f'Replay log uses format version {version}, expected {FORMAT_VERSION}.')
+        offset = HEADER.size
+        digest = blob[offset:offset + DIGEST_SIZE]
+        offset += DIGEST_SIZE
+        seed = int.from_bytes(blob[offset:offset + seed_bytes], 'little')
+        offset += seed_bytes
+        name = blob[offset:offset + name_bytes].decode()
+        offset += name_bytes
+        return cls(name, seed, enemy_count, None if maze_size < 0 else maze_size,
+                   blob[offset:offset + command_bytes], digest if any(digest) else None)
+
+
+def state_digest(engine):
+    """
+    Hashes a game's state
+    :param engine: GameEngine on a MazeGrid
+    :return: 16 bytes, equal for games in the same state
+    """
+    # Only the game itself counts, so a RecordingEngine and the GameEngine replaying its log agree
+    snapshot = dsnap.Snapshot.take(engine, game_only=True)
+    return hashlib.blake2b(snapshot.to_bytes(), digest_size=DIGEST_SIZE).digest()
+
+
+def save_log(path, log):
+    with open(path, 'wb') as file:
+        file.write(log.to_bytes())
+
+
+def load_log(path):
+    with open(path, 'rb') as file:
+        return ReplayLog.from_bytes(file.read())
+
+
+def replay_corpus(paths):
+    """
+    Replays logs and checks each against its recorded digest
+    :param paths: Log files
+    :return: (number of logs that replayed to their recorded state, list of paths that didn't, seconds taken)
+    """
+    start = time.perf_counter()
+    failed = [path for path in paths if not load_log(path).check()]
+    return len(paths) - len(failed), failed, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replays recorded sessions and checks their final states.')
+    parser.add_argument('logs', nargs='+', help='replay log files')
+    args = parser.parse_args(argv)
+
+    passed, failed, seconds = replay_corpus(args.logs)
+    for path in failed:
+        print(f'MISMATCH {path}')
+    print(f'{passed} of {len(args.logs)} logs replayed to their recorded state in {seconds:.2f} s.')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
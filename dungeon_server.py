@@ -0,0 +1,260 @@
+"""
+Network play for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+GameServer: asyncio TCP server hosting any number of independent games in one process, one per connection,
+using the same prompts and text as the command line game (telnet or netcat work as clients)
+GameSession: one connected player with their own GameEngine (maze, player, enemies, and dice), DungeonEngine
+with --levels, or WanderingEngine with --wander
+main: command line entry point, e.g. python dungeon_server.py --port 8023, then telnet localhost 8023
+"""
+
+import argparse
+import asyncio
+
+import numpy as np
+
+import dungeon_engine as dengine
+import dungeon_levels as dlevels
+import dungeon_render as drender
+import dungeon_wander as dwander
+
+
+HEADER = '=============================================\n\n' \
+         "     BeardedVagabond's Dungeon Crawler\n\n" \
+         '=============================================\n\n'
+EXPLORE_PROMPT = 'Do you wish to [M]ove, [L]ook around room, [C]heck map, Check [h]ealth, [R]est, or E[x]it? '
+LEVELS_EXPLORE_PROMPT = 'Do you wish to [M]ove, [L]ook around room, [C]heck map, Check [h]ealth, [R]est, ' \
+                        'go [U]p the stairs, or E[x]it? '
+FIGHT_PROMPT = 'What would you like to do? [A]ttack, [R]un away: '
+DIRECTION_PROMPT = 'Where would you like to move?\n[N]orth, [E]ast, [S]outh, [W]est: '
+
+
+class GameSession:
+
+    def __init__(self, reader, writer, seed=None, maze_size=None, idle_timeout=600, maze_path=None, levels=False,
+                 wander=False):
+        self.reader = reader
+        self.writer = writer
+        self.seed = seed  # DicePool seed of this session's game
+        self.maze_size = maze_size  # side of a random maze, None for the built-in mazes
+        self.maze_path = maze_path  # maze file to play instead, if any
+        self.levels = levels  # True to descend through a DungeonEngine's levels instead of ending at the exit
+        self.wander = wander  # True for a WanderingEngine, whose enemies move every turn
+        self.idle_timeout = idle_timeout  # seconds to wait for a line before closing the session
+        self.engine = None
+        self.renderer = None
+
+    def __str__(self):
+        return f"Session of {self.engine}" if self.engine else "Session waiting for a name."
+
+    def send(self, text):
+        """
+        Queues text for the client, with telnet line endings
+        :param text: UI output
+        :return: N/A
+        """
+        self.writer.write(text.replace('\n', '\r\n').encode())
+
+    async def ask(self, prompt):
+        """
+        Sends a prompt and waits for the reply
+        :param prompt: Prompt text
+        :return: Stripped reply, or None when the client disconnects or stays idle
+        """
+        self.send(prompt)
+        await self.writer.drain()
+        try:
+            line = await asyncio.wait_for(self.reader.readline(), self.idle_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            return None
+        if not line:
+            return None
+        return line.decode(errors='replace').strip()
+
+    async def read_direction(self):
+        """
+        Asks for a direction until one is entered
+        :return: Lowercase direction string, or None when the client leaves
+        """
+        direction = ''
+        while not direction:
+            direction = await self.ask(DIRECTION_PROMPT)
+            if direction is None:
+                return None
+            if not direction:
+                self.send('No input detected, please re-enter a direction\n\n')
+        return direction.lower()
+
+    def show(self, events):
+        """
+        Sends the UI output for a list of engine events, as bv_dungeon_game.show prints it
+        :param events: List of Events from GameEngine.step
+        :return: N/A
+        """
+        for event in events:
+            self.send(dengine.describe(event) + '\n')
+            if event.kind == 'map':
+                x, y = event.value[:2]
+                # Enemies in rooms the player hasn't seen stay hidden by the renderer's ExploredMap
+                self.send('\n'.join(self.renderer.render(x, y, self.engine.enemies)) + '\n\n')
+
+    async def run(self):
+        """
+        Plays one game: asks for a name, then plays until the game ends or the client leaves, closing the engine
+        :return: N/A
+        """
+        self.send(HEADER)
+        player_name = ''
+        while not player_name:
+            player_name = await self.ask('What is your name? ')
+            if player_name is None:
+                return
+            if not player_name:
+                self.send('Input not recognized. Please re-enter a name.\n\n')
+
+        if self.levels:
+            options = {} if self.maze_size is None else {'maze_size': self.maze_size}
+            engine = self.engine = dlevels.DungeonEngine.new_game(player_name, self.seed, **options)
+        else:
+            engine_class = dwander.WanderingEngine if self.wander else dengine.GameEngine
+            engine = self.engine = engine_class.new_game(player_name, self.seed, maze_size=self.maze_size,
+                                                         maze_path=self.maze_path)
+        try:
+            await self.play(engine)
+        finally:
+            engine.close()
+
+    async def play(self, engine):
+        """
+        Reads commands until the game ends or the client leaves
+        :param engine: GameEngine of this session
+        :return: N/A
+        """
+        self.send(f'A heroic adventurer wanders into a maze...\n{engine.player}\n')
+        explore_prompt = LEVELS_EXPLORE_PROMPT if self.levels else EXPLORE_PROMPT
+        while engine.mode != dengine.OVER:
+            # A DungeonEngine swaps mazes as the player takes the stairs
+            if self.renderer is None or self.renderer.maze is not engine.maze:
+                self.renderer = drender.MazeRenderer(engine.maze, explored=engine.explored)
+
+            cmd = await self.ask(FIGHT_PROMPT if engine.mode == dengine.FIGHT else explore_prompt)
+            if cmd is None:
+                return
+            if not cmd:
+                self.send('No input detected, please re-enter a command\n\n')
+                continue
+
+            cmd = cmd.lower()
+            if engine.mode == dengine.EXPLORE and cmd == 'm':
+                events = []
+                while not events or events[0].kind != 'moved':
+                    direction = await self.read_direction()
+                    if direction is None:
+                        return
+                    events = engine.step(cmd, direction)
+                    self.show(events)
+
+            else:
+                if engine.mode == dengine.FIGHT and cmd == 'a':
+                    self.send('Rolling some dice...\n\n')
+                self.show(engine.step(cmd))
+        self.send('\n')
+        await self.writer.drain()
+
+
+class GameServer:
+
+    def __init__(self, host='127.0.0.1', port=8023, seed=None, maze_size=None, idle_timeout=600, maze_path=None,
+                 levels=False, wander=False):
+        """
+        :param host: Address to listen on (loopback by default)
+        :param port: TCP port (0 picks a free one, see port after start)
+        :param seed: Seed for reproducible games; session n plays with seed [seed, n]
+        :param maze_size: Side of a random maze for every game, None for the built-in mazes
+        :param idle_timeout: Seconds a session may wait for input before it is closed
+        :param maze_path: Maze file every game plays instead (see dungeon_mazefile), shared through the page cache
+        :param levels: Play multi-level dungeons (see dungeon_levels) instead of single mazes
+        :param wander: Move every undefeated enemy one room after each turn the player spends exploring (see
+                       dungeon_wander)
+        """
+        self.host = host
+        self.port = port
+        self.seed = seed
+        self.maze_size = maze_size
+        self.idle_timeout = idle_timeout
+        self.maze_path = maze_path
+        self.levels = levels
+        self.wander = wander
+        self.sessions = set()  # GameSession objects currently connected
+        self.played = 0  # number of sessions started
+        self._server = None
+
+    def __str__(self):
+        return f"Dungeon server on {self.host}:{self.port} with {len(self.sessions)} players."
+
+    async def start(self):
+        """
+        Starts listening; sessions are served by the running event loop
+        :return: N/A
+        """
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stops listening and disconnects every session
+        :return: N/A
+        """
+        if self._server is not None:
+            self._server.close()
+            for session in list(self.sessions):
+                session.writer.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        seed = None if self.seed is None else np.random.SeedSequence([self.seed, self.played])
+        self.played += 1
+        session = GameSession(reader, writer, seed, self.maze_size, self.idle_timeout, self.maze_path, self.levels,
+                              self.wander)
+        self.sessions.add(session)
+        try:
+            await session.run()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions.discard(session)
+            writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hosts BeardedVagabond's Dungeon Crawler over TCP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8023)
+    parser.add_argument('--seed', type=int, help='seed for reproducible games')
+    parser.add_argument('--maze-size', type=int, help='play random mazes of this size instead of the built-in ones')
+    parser.add_argument('--maze-file', help='play this maze file (see dungeon_mazefile) instead')
+    parser.add_argument('--levels', action='store_true',
+                        help='descend through random levels (see dungeon_levels) instead of ending at the exit')
+    parser.add_argument('--wander', action='store_true',
+                        help='move every enemy one room after each turn (see dungeon_wander)')
+    args = parser.parse_args(argv)
+    if args.levels and args.maze_file:
+        parser.error('--levels plays random levels and cannot be combined with --maze-file')
+    if args.wander and (args.levels or args.maze_file):
+        parser.error('--wander cannot be combined with --levels or --maze-file')
+
+    server = GameServer(args.host, args.port, args.seed, args.maze_size, maze_path=args.maze_file,
+                        levels=args.levels, wander=args.wander)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
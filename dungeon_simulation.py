@@ -0,0 +1,226 @@
+"""
+Batch combat simulation for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+Runs many fights at once with NumPy arrays instead of one swing at a time through attack_target
+simulate_fights: vectorized fight engine following the Combatant.attack, sustain_damage, and attack_target rules
+simulate_matchup: convenience wrapper taking two Combatant objects
+roll_stats: vectorized Die.stats_rolls, rolling any number of stat blocks at once
+stat_modifiers / combat_stats: vectorized versions of the Combatant modifier, AC, and MaxHP calculations
+FightResults: holds per-fight outcomes and summarizes win probability, fight length, and remaining HP
+"""
+
+import numpy as np
+
+
+# Bump whenever the combat rules below change so cached results can be invalidated
+RULES_VERSION = 1
+
+# Fight outcomes stored in FightResults.winner
+DRAW = 0
+ATTACKER = 1
+DEFENDER = 2
+
+# A single swing needs a d20 and up to two d8 rolls, drawn together as one integer in [0, 20 * 8 * 8)
+_SWING_OUTCOMES = 20 * 8 * 8
+
+
+class FightResults:
+
+    def __init__(self, winner, rounds, attacker_hp, defender_hp):
+        self.winner = winner  # (matchups, fights) array of DRAW, ATTACKER, or DEFENDER
+        self.rounds = rounds  # (matchups, fights) array of rounds fought
+        self.attacker_hp = attacker_hp  # (matchups, fights) array of attacker HP at the end of the fight
+        self.defender_hp = defender_hp  # (matchups, fights) array of defender HP at the end of the fight
+
+    def __str__(self):
+        return f"{self.winner.size} fights over {self.winner.shape[0]} matchups, " \
+               f"attacker wins {self.win_probability().mean():.1%}, " \
+               f"mean length of {self.rounds.mean():.2f} rounds."
+
+    def win_probability(self, side=ATTACKER):
+        """
+        Fraction of fights won by one side for each matchup
+        :param side: ATTACKER, DEFENDER, or DRAW
+        :return: Array of probabilities, one per matchup
+        """
+        return (self.winner == side).mean(axis=1)
+
+    def length_distribution(self, max_rounds=None):
+        """
+        Distribution of fight length over all fights
+        :param max_rounds: Length of the returned array (defaults to the longest fight)
+        :return: Array where entry r is the fraction of fights lasting r rounds
+        """
+        minlength = 0 if max_rounds is None else max_rounds + 1
+        counts = np.bincount(self.rounds.ravel(), minlength=minlength)
+        return counts / self.rounds.size
+
+    def remaining_hp_distribution(self, side=ATTACKER):
+        """
+        Distribution of remaining HP for one side over all fights
+        :param side: ATTACKER or DEFENDER
+        :return: Array where entry h is the fraction of fights ending with h HP
+        """
+        hp = self.attacker_hp if side == ATTACKER else self.defender_hp
+        return np.bincount(hp.ravel()) / hp.size
+
+
+def _drop_lowest_table():
+    """
+    :return: int8 array of the sum of the largest three dice for every ordered roll of 4d6
+    """
+    dice = np.indices((6, 6, 6, 6)).reshape(4, -1) + 1
+    return (dice.sum(axis=0) - dice.min(axis=0)).astype(np.int8)
+
+
+_STAT_OUTCOMES = 6 ** 4
+_DROP_LOWEST = _drop_lowest_table()
+
+
+def roll_stats(count, seed=None):
+    """
+    Rolls stat blocks like Die.stats_rolls for many characters at once: each stat is the largest three of 4d6
+    One draw picks all four dice of a stat, which a lookup table turns into the stat.
+    :param count: Number of stat blocks
+    :param seed: Seed or numpy Generator for reproducible results
+    :return: (count, 6) int8 array of [STR, DEX, CON, INT, WIS, CHR] stat blocks, ready for combat_stats
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    return _DROP_LOWEST[rng.integers(0, _STAT_OUTCOMES, size=(count, 6), dtype=np.int16)]
+
+
+def stat_modifiers(stats):
+    """
+    Calculates stat modifiers like Combatant.__init__ for any number of stats at once
+    :param stats: Array of stats (any shape)
+    :return: Array of modifiers, -4 for 2-3 up to +4 for 18-19, and 0 outside that range
+    """
+    stats = np.asarray(stats)
+    return np.where((stats >= 2) & (stats < 20), stats // 2 - 5, 0)
+
+
+def combat_stats(stats):
+    """
+    Calculates what a fight needs from stat blocks, like Combatant.__init__
+    :param stats: Array of [STR, DEX, CON, INT, WIS, CHR] stat blocks, shape (..., 6)
+    :return: modifiers with the same shape, AC (leather armor), MaxHP (level 1 rogue)
+    """
+    modifiers = stat_modifiers(stats)
+    return modifiers, 11 + modifiers[..., 1], 8 + modifiers[..., 2]
+
+
+def _swing(rng, str_mod, target_ac, target_hp, target_max_hp):
+    """
+    Resolves one attack for every active fight
+    :param rng: numpy Generator used for the dice
+    :param str_mod: Attacker STR modifiers
+    :param target_ac: Target armor classes
+    :param target_hp: Target HP before the attack
+    :param target_max_hp: Target MaxHP used to saturate HP
+    :return: Target HP after the attack
+    """
+    outcome = rng.integers(0, _SWING_OUTCOMES, size=str_mod.size, dtype=np.int16)
+    d20_roll = outcome % 20 + 1
+    damage_dice = (outcome // 20) % 8 + 1
+    crit = d20_roll == 20
+
+    # Combatant.attack: a natural 20 is a critical, otherwise the roll must meet the target's AC
+    hit = crit | (d20_roll >= target_ac)
+    # attack_target rolls a second d8 for critical hits
+    damage_dice += np.where(crit, outcome // 160 + 1, 0).astype(np.int16)
+
+    # Combatant.sustain_damage: damage adds the STR modifier and HP saturates between 0 and MaxHP
+    hp_after = np.clip(target_hp - (damage_dice + str_mod), 0, target_max_hp)
+    return np.where(hit, hp_after, target_hp)
+
+
+def simulate_fights(attacker_modifiers, attacker_ac, attacker_max_hp,
+                    defender_modifiers, defender_ac, defender_max_hp,
+                    fights=1, attacker_hp=None, defender_hp=None, seed=None, max_rounds=200):
+    """
+    Simulates fights between attackers and defenders using the fight_loop order of play
+    The attacker always swings first and the defender answers if still standing, as in fight_loop.
+    Dice are rolled with replacement over 1..sides, so a natural 20 scores a critical hit.
+    :param attacker_modifiers: Modifier lists [STR, DEX, CON, INT, WIS, CHR], shape (6,) or (matchups, 6)
+    :param attacker_ac: Attacker armor class, scalar or shape (matchups,)
+    :param attacker_max_hp: Attacker MaxHP, scalar or shape (matchups,)
+    :param defender_modifiers: Modifier lists for the defenders, shape (6,) or (matchups, 6)
+    :param defender_ac: Defender armor class, scalar or shape (matchups,)
+    :param defender_max_hp: Defender MaxHP, scalar or shape (matchups,)
+    :param fights: Number of fights to simulate for each matchup
+    :param attacker_hp: Starting attacker HP (defaults to MaxHP)
+    :param defender_hp: Starting defender HP (defaults to MaxHP)
+    :param seed: Seed or numpy Generator for reproducible results
+    :param max_rounds: Rounds after which an unfinished fight is recorded as a draw
+    :return: FightResults with arrays of shape (matchups, fights)
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+    a_str = np.asarray(attacker_modifiers)[..., 0]
+    d_str = np.asarray(defender_modifiers)[..., 0]
+    if attacker_hp is None:
+        attacker_hp = attacker_max_hp
+    if defender_hp is None:
+        defender_hp = defender_max_hp
+
+    # Broadcast every stat to one entry per fight
+    columns = np.broadcast_arrays(a_str, attacker_ac, attacker_max_hp, attacker_hp,
+                                  d_str, defender_ac, defender_max_hp, defender_hp)
+    matchups = np.atleast_1d(columns[0]).shape[0]
+    columns = [np.repeat(np.atleast_1d(column).astype(np.int16), fights) for column in columns]
+    a_str, a_ac, a_max, a_hp, d_str, d_ac, d_max, d_hp = columns
+
+    total = matchups * fights
+    winner = np.zeros(total, dtype=np.int8)
+    rounds = np.full(total, max_rounds, dtype=np.int32)
+    attacker_left = a_hp.copy()
+    defender_left = d_hp.copy()
+
+    # Fights still running are kept compacted so every round only touches live fights
+    live = np.arange(total)
+    for round_number in range(1, max_rounds + 1):
+        if not live.size:
+            break
+
+        # attacker swings first
+        d_hp = _swing(rng, a_str, d_ac, d_hp, d_max)
+        done = d_hp == 0
+        winner[live[done]] = ATTACKER
+
+        # defender answers if still standing
+        a_hp = np.where(done, a_hp, _swing(rng, d_str, a_ac, a_hp, a_max))
+        lost = (a_hp == 0) & ~done
+        winner[live[lost]] = DEFENDER
+        done |= lost
+
+        if done.any():
+            finished = live[done]
+            rounds[finished] = round_number
+            attacker_left[finished] = a_hp[done]
+            defender_left[finished] = d_hp[done]
+
+            keep = ~done
+            live = live[keep]
+            a_str, a_ac, a_max, a_hp = a_str[keep], a_ac[keep], a_max[keep], a_hp[keep]
+            d_str, d_ac, d_max, d_hp = d_str[keep], d_ac[keep], d_max[keep], d_hp[keep]
+
+    # Anything still running hit max_rounds and stays a draw
+    attacker_left[live] = a_hp
+    defender_left[live] = d_hp
+
+    shape = (matchups, fights)
+    return FightResults(winner.reshape(shape), rounds.reshape(shape),
+                        attacker_left.reshape(shape), defender_left.reshape(shape))
+
+
+def simulate_matchup(attacker, defender, fights, seed=None):
+    """
+    Simulates repeated fights between two Combatant objects starting from their current HP
+    :param attacker: Combatant that swings first (the player in fight_loop)
+    :param defender: Combatant that answers each attack
+    :param fights: Number of fights to simulate
+    :param seed: Seed or numpy Generator for reproducible results
+    :return: FightResults for a single matchup
+    """
+    return simulate_fights(attacker.modifiers, attacker.AC, attacker.MaxHP,
+                           defender.modifiers, defender.AC, defender.MaxHP,
+                           fights=fights, attacker_hp=attacker.HP, defender_hp=defender.HP, seed=seed)
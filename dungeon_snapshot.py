@@ -0,0 +1,293 @@
+"""
+Game state snapshots for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+Snapshot: everything a GameEngine needs to continue a game (maze, player, enemies, mode, dice state, explored
+rooms, and the engine class with its snapshot_extra state), restorable any number of times into independent engines
+of the same class that share the unchanging parts
+save / load: Snapshot to and from a compact versioned binary blob
+fork: independent copy of a running GameEngine
+Engine subclasses are only snapshotted if they define snapshot_extra and restore_extra themselves, so a subclass
+with state of its own is never silently restored as its parent.
+
+Blob layout (little-endian):
+    header: magic b'BVDS', format version (uint16), mode (uint8), 1 if d8 shares d20's DicePool (uint8),
+            fighter (int32, -1 for none), last location y, x (int32), maze choice (int32, -1 for a random maze),
+            width, height (int32), finish x, y (int32, -1 for none), combatants (uint32), name bytes (uint32),
+            explored map bytes, engine class bytes, extra bytes (uint32)
+    names: UTF-8 names of the player then each enemy, separated by '\\0'
+    combatants: one record per combatant (player first): stats (6 x int8), HP (int16), x, y (int32), defeated (int8)
+    dice: one or two pool states: generator state, then each die size's block as sides, rolls drawn, next roll,
+          and the generator state it was drawn from (the rolls themselves are redrawn on load)
+    maze: room codes, two per byte (low nibble first), rows top to bottom
+    explored: the player's ExploredMap.to_bytes (see dungeon_fog)
+    engine: 'module:qualified name' of the engine class (UTF-8), then its snapshot_extra bytes
+"""
+
+import importlib
+import struct
+import sys
+import weakref
+
+import numpy as np
+
+import dungeon_classes as dc
+import dungeon_engine as de
+import dungeon_fog as dfog
+import dungeon_grid as dg
+
+
+MAGIC = b'BVDS'
+FORMAT_VERSION = 3
+HEADER = struct.Struct('<4sHBBiiiiiiiiIIIII')
+RECORD = np.dtype([('stats', 'i1', 6), ('HP', '<i2'), ('x', '<i4'), ('y', '<i4'), ('defeated', 'i1')])
+GENERATOR_STATE = struct.Struct('<16s16sII')  # PCG64 state, increment, has_uint32, uinteger
+POOL = struct.Struct('<H')  # number of blocks
+BLOCK = struct.Struct('<HII')  # sides, rolls drawn, index of the next roll
+
+MODES = (de.EXPLORE, de.FIGHT, de.OVER)
+
+_packed_mazes = weakref.WeakKeyDictionary()  # MazeGrid -> nibble-packed room codes
+_unpacked_mazes = weakref.WeakValueDictionary()  # nibble-packed room codes -> MazeGrid
+
+
+class Snapshot:
+
+    def __init__(self, maze, maze_choice, mode, fighter, last_location, combatants, pools, shared_pool, explored,
+                 engine_class=de.GameEngine, extra=b''):
+        self.maze = maze  # MazeGrid, shared by every engine restored from this snapshot
+        self.maze_choice = maze_choice
+        self.mode = mode
+        self.fighter = fighter  # index of the enemy fighting the player, -1 for none
+        self.last_location = last_location  # (y, x) of the room the player would run back to
+        self.combatants = combatants  # (name, stats, HP, x, y, defeated) of the player then each enemy
+        self.pools = pools  # (DicePool.get_state(), SeedSequence) of the d20's pool, then the d8's if separate
+        self.shared_pool = shared_pool  # True if d20 and d8 roll from the same DicePool
+        self.explored = explored  # ExploredMap.to_bytes of the rooms the player has entered
+        self.engine_class = engine_class  # GameEngine or the subclass restored engines are made with
+        self.extra = extra  # engine's snapshot_extra
+
+    def __str__(self):
+        return f"Snapshot of {self.combatants[0][0]} at ({self.combatants[0][3]}, {self.combatants[0][4]}) " \
+               f"with {len(self.combatants) - 1} enemies, {self.mode} mode."
+
+    @classmethod
+    def take(cls, engine, game_only=False):
+        """
+        Captures a GameEngine's state; later moves in the game don't change the snapshot
+        :param engine: GameEngine on a MazeGrid
+        :param game_only: Keep only the state every GameEngine has, restored as a plain GameEngine (e.g. to compare
+                          games played by different engine classes)
+        :return: Snapshot
+        """
+        if not isinstance(engine.maze, dg.MazeGrid):
+            raise ValueError('Snapshots need a game on a MazeGrid maze.')
+        engine_class = de.GameEngine if game_only else type(engine)
+        if 'snapshot_extra' not in vars(engine_class) or 'restore_extra' not in vars(engine_class):
+            raise TypeError(f'{engine_class.__name__} does not define snapshot_extra and restore_extra, so it '
+                            f'cannot be snapshotted.')
+        combatants = [(c.name, c.stats, c.HP, c.x_location, c.y_location, c.defeated)
+                      for c in [engine.player] + engine.enemies]
+        pools = [engine.d20.pool] if engine.d8.pool is engine.d20.pool else [engine.d20.pool, engine.d8.pool]
+        fighter = -1 if engine.fighter is None else engine.enemies.index(engine.fighter)
+        return cls(engine.maze, engine.maze_choice, engine.mode, fighter, tuple(engine.last_location), combatants,
+                   [(pool.get_state(), pool.seed_sequence) for pool in pools], len(pools) == 1,
+                   engine.explored.to_bytes(), engine_class, b'' if game_only else engine.snapshot_extra())
+
+    def restore(self):
+        """
+        Builds a new engine at the snapshot's state; each call is an independent branch of the game
+        :return: Instance of engine_class
+        """
+        combatants = [_combatant(dc.Player, *self.combatants[0])]
+        combatants += [_combatant(dc.Combatant, *record) for record in self.combatants[1:]]
+
+        pools = [dc.DicePool.from_state(state, seed_sequence) for state, seed_sequence in self.pools]
+        d20 = dc.Die(20, pools[0])
+        d8 = dc.Die(8, pools[-1])
+
+        engine = self.engine_class(self.maze, combatants[0], combatants[1:], d20, d8, self.maze_choice)
+        engine.mode = self.mode
+        engine.fighter = None if self.fighter < 0 else engine.enemies[self.fighter]
+        engine.last_location = list(self.last_location)
+        engine.explored = dfog.ExploredMap.from_bytes(self.explored, self.maze)
+        engine.restore_extra(self.extra)
+        return engine
+
+    def to_bytes(self):
+        """
+        Packs the snapshot into a binary blob
+        :return: bytes
+        """
+        names = '\0'.join([record[0] for record in self.combatants]).encode()
+        records = np.array([(stats, hp, x, y, defeated) for _, stats, hp, x, y, defeated in self.combatants],
+                           dtype=RECORD)
+        finish_x, finish_y = self.maze.finish if self.maze.finish is not None else (-1, -1)
+        engine_name = f'{self.engine_class.__module__}:{self.engine_class.__qualname__}'.encode()
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, MODES.index(self.mode), self.shared_pool, self.fighter,
+                             self.last_location[0], self.last_location[1],
+                             -1 if self.maze_choice is None else self.maze_choice,
+                             self.maze.width, self.maze.height, finish_x, finish_y, len(records), len(names),
+                             len(self.explored), len(engine_name), len(self.extra))
+        pools = b''.join([_pack_pool(state) for state, _ in self.pools])
+        return b''.join([header, names, records.tobytes(), pools, _pack_maze(self.maze), self.explored, engine_name,
+                         self.extra])
+
+    @classmethod
+    def from_bytes(cls, blob):
+        """
+        Unpacks a blob from to_bytes
+        :param blob: bytes
+        :return: Snapshot
+        """
+        if blob[:4] != MAGIC:
+            raise ValueError('Not a game snapshot.')
+        (_, version, mode, shared_pool, fighter, last_y, last_x, maze_choice,
+         width, height, finish_x, finish_y, count, name_bytes, explored_bytes, engine_bytes,
+         extra_bytes) = HEADER.unpack_from(blob)
+        if version != FORMAT_VERSION:
+            raise ValueError(f'Snapshot uses format version {version}, expected {FORMAT_VERSION}.')
+        offset = HEADER.size
+
+        names = blob[offset:offset + name_bytes].decode().split('\0')
+        offset += name_bytes
+        records = np.frombuffer(blob, dtype=RECORD, count=count, offset=offset)
+        offset += records.nbytes
+        combatants = [(name, stats, hp, x, y, defeated)
+                      for name, (stats, hp, x, y, defeated) in zip(names, records.tolist())]
+
+        # Buffered rolls are redrawn here once, then shared by every engine restored from this snapshot
+        pools = []
+        for _ in range(1 if shared_pool else 2):
+            state, offset = _unpack_pool(blob, offset)
+            pool = dc.DicePool.from_state(state)
+            pools.append((pool.get_state(), pool.seed_sequence))
+
+        finish = (finish_x, finish_y) if finish_x >= 0 else None
+        maze = _unpack_maze(blob[offset:offset + (width * height + 1) // 2], width, height, finish)
+        offset += (width * height + 1) // 2
+        explored = bytes(blob[offset:offset + explored_bytes])
+        offset += explored_bytes
+        engine_class = _engine_class(bytes(blob[offset:offset + engine_bytes]).decode())
+        offset += engine_bytes
+        extra = bytes(blob[offset:offset + extra_bytes])
+        return cls(maze, None if maze_choice < 0 else maze_choice, MODES[mode], fighter, (last_y, last_x),
+                   combatants, pools, bool(shared_pool), explored, engine_class, extra)
+
+
+def _engine_class(name):
+    """
+    Finds the engine class a blob was saved from; only the game's own dungeon_* modules are imported for it
+    :param name: 'module:qualified name'
+    :return: GameEngine or a subclass
+    """
+    module_name, _, qualname = name.partition(':')
+    module = sys.modules.get(module_name)
+    if module is None and module_name.startswith('dungeon_'):
+        module = importlib.import_module(module_name)
+    engine_class = module
+    for attribute in qualname.split('.') if module is not None else ():
+        engine_class = getattr(engine_class, attribute, None)
+    if not (isinstance(engine_class, type) and issubclass(engine_class, de.GameEngine)):
+        raise ValueError(f'Snapshot of an unknown engine class {name}.')
+    return engine_class
+
+
+# Stat modifier by stat value (0 outside the 2 - 19 range, as in Combatant.__init__)
+_MODIFIERS = {stat: (stat - 10) // 2 if 2 <= stat <= 19 else 0 for stat in range(-128, 128)}
+
+
+def _combatant(cls, name, stats, hp, x, y, defeated):
+    # Skips Combatant.__init__ and its modifier range checks; modifiers, AC, and MaxHP follow the same rules
+    combatant = cls.__new__(cls)
+    combatant.name = name
+    combatant.stats = list(stats)
+    combatant.modifiers = [_MODIFIERS[stat] for stat in stats]
+    combatant.AC = 11 + combatant.modifiers[1]
+    combatant.MaxHP = 8 + combatant.modifiers[2]
+    combatant.HP = hp
+    combatant.x_location = x
+    combatant.y_location = y
+    combatant.defeated = defeated
+    return combatant
+
+
+def _pack_generator_state(state):
+    words = state['state']
+    return GENERATOR_STATE.pack(words['state'].to_bytes(16, 'little'), words['inc'].to_bytes(16, 'little'),
+                                state['has_uint32'], state['uinteger'])
+
+
+def _unpack_generator_state(blob, offset):
+    state, inc, has_uint32, uinteger = GENERATOR_STATE.unpack_from(blob, offset)
+    return {'bit_generator': 'PCG64',
+            'state': {'state': int.from_bytes(state, 'little'), 'inc': int.from_bytes(inc, 'little')},
+            'has_uint32': has_uint32, 'uinteger': uinteger}, offset + GENERATOR_STATE.size
+
+
+def _pack_pool(state):
+    generator_state, blocks = state
+    parts = [_pack_generator_state(generator_state), POOL.pack(len(blocks))]
+    for sides, (_, position, block_state, size) in blocks.items():
+        parts += [BLOCK.pack(sides, size, position), _pack_generator_state(block_state)]
+    return b''.join(parts)
+
+
+def _unpack_pool(blob, offset):
+    generator_state, offset = _unpack_generator_state(blob, offset)
+    (count,) = POOL.unpack_from(blob, offset)
+    offset += POOL.size
+    blocks = {}
+    for _ in range(count):
+        sides, size, position = BLOCK.unpack_from(blob, offset)
+        block_state, offset = _unpack_generator_state(blob, offset + BLOCK.size)
+        blocks[sides] = (None, position, block_state, size)
+    return (generator_state, blocks), offset
+
+
+def _pack_maze(maze):
+    packed = _packed_mazes.get(maze)
+    if packed is None:
+        codes = dg.MASK_ROOMS[maze.masks].astype(np.uint8).ravel()
+        if len(codes) % 2:
+            codes = np.append(codes, np.uint8(0))
+        packed = _packed_mazes[maze] = (codes[0::2] | (codes[1::2] << 4)).tobytes()
+    return packed
+
+
+def _unpack_maze(packed, width, height, finish):
+    # Loaded snapshots of the same maze share one MazeGrid, as restored engines do
+    maze = _unpacked_mazes.get((packed, finish))
+    if maze is None:
+        nibbles = np.frombuffer(packed, dtype=np.uint8)
+        codes = np.empty(2 * len(nibbles), dtype=np.uint8)
+        codes[0::2] = nibbles & 0x0F
+        codes[1::2] = nibbles >> 4
+        maze = dg.MazeGrid.from_indexes(codes[:width * height].reshape(height, width), finish)
+        _unpacked_mazes[(packed, finish)] = maze
+    return maze
+
+
+def save(engine):
+    """
+    Packs a game into a binary blob
+    :param engine: GameEngine on a MazeGrid
+    :return: bytes
+    """
+    return Snapshot.take(engine).to_bytes()
+
+
+def load(blob):
+    """
+    Restores a game from a blob made by save
+    :param blob: bytes
+    :return: Engine of the class the game was saved from
+    """
+    return Snapshot.from_bytes(blob).restore()
+
+
+def fork(engine):
+    """
+    Copies a running game; the copy and the original continue independently from the same dice stream position
+    :param engine: GameEngine on a MazeGrid
+    :return: Engine of the same class
+    """
+    return Snapshot.take(engine).restore()
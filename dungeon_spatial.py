@@ -0,0 +1,109 @@
+"""
+Spatial lookup of enemies for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+SpatialIndex: maps each room to the ids of the enemies in it, for O(1) "who is in this room" queries,
+updated as enemies move or rebuilt in bulk from location arrays
+"""
+
+import dungeon_lazy as dlazy
+
+np = dlazy.LazyModule('numpy')
+
+
+class SpatialIndex:
+
+    def __init__(self):
+        self._rooms = {}  # (x, y) -> list of entity ids in that room
+        self._locations = {}  # entity id -> (x, y)
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __str__(self):
+        return f"{len(self._locations)} entities in {len(self._rooms)} rooms."
+
+    @classmethod
+    def from_combatants(cls, combatants):
+        """
+        Indexes Combatant objects by their position in the list
+        :param combatants: List of Combatant objects
+        :return: SpatialIndex
+        """
+        index = cls()
+        for entity, combatant in enumerate(combatants):
+            index.place(entity, combatant.x_location, combatant.y_location)
+        return index
+
+    def place(self, entity, x, y):
+        """
+        Adds an entity to a room, or moves it there if already indexed
+        :param entity: Entity id
+        :param x: Column of the room
+        :param y: Row of the room
+        :return: N/A
+        """
+        if entity in self._locations:
+            self.remove(entity)
+        self._locations[entity] = (x, y)
+        self._rooms.setdefault((x, y), []).append(entity)
+
+    def move(self, entity, x, y):
+        """
+        Moves an indexed entity to a new room
+        :return: N/A
+        """
+        self.place(entity, x, y)
+
+    def remove(self, entity):
+        """
+        Removes an entity from the index
+        :param entity: Entity id
+        :return: N/A
+        """
+        room = self._locations.pop(entity)
+        occupants = self._rooms[room]
+        occupants.remove(entity)
+        if not occupants:
+            del self._rooms[room]
+
+    def at(self, x, y):
+        """
+        Entities in a room
+        :param x: Column of the room
+        :param y: Row of the room
+        :return: List of entity ids (empty if nobody is there)
+        """
+        return self._rooms.get((x, y), [])
+
+    def location(self, entity):
+        """
+        :param entity: Entity id
+        :return: (x, y) of the entity
+        """
+        return self._locations[entity]
+
+    def rebuild(self, x_locations, y_locations, entities=None):
+        """
+        Replaces the whole index from location arrays, grouping entities by room with one sort
+        :param x_locations: Array of columns
+        :param y_locations: Array of rows
+        :param entities: Array of entity ids (defaults to 0..n-1)
+        :return: N/A
+        """
+        x_locations = np.asarray(x_locations, dtype=np.int64)
+        y_locations = np.asarray(y_locations, dtype=np.int64)
+        entities = np.arange(len(x_locations)) if entities is None else np.asarray(entities)
+        if not len(x_locations):
+            self._rooms, self._locations = {}, {}
+            return
+
+        keys = (y_locations << 32) | x_locations
+        order = np.argsort(keys, kind='stable')
+        keys, entities = keys[order], entities[order].tolist()
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])).tolist() + [len(keys)]
+
+        rooms = {}
+        for start, stop in zip(starts, starts[1:]):
+            key = int(keys[start])
+            rooms[(key & 0xFFFFFFFF, key >> 32)] = entities[start:stop]
+        self._rooms = rooms
+        self._locations = dict(zip(entities, zip((x_locations[order]).tolist(), (y_locations[order]).tolist())))
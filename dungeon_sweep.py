@@ -0,0 +1,154 @@
+"""
+Matchup sweeps for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+Fights every player stat block against every enemy stat block with dungeon_simulation, spread over all cores
+run_sweep: splits the sweep into chunks, runs them in a process pool, and caches every finished chunk on disk
+SweepResults: per-matchup win rates, fight lengths, and remaining HP as (players, enemies) arrays
+
+Each chunk is keyed by its stat blocks, the fight settings, the seed, and dungeon_simulation.RULES_VERSION.
+Its dice stream is seeded from that key, so results don't depend on worker count or chunk order,
+repeated sweeps load finished chunks from the cache, and an interrupted sweep picks up where it stopped.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+import os
+
+import numpy as np
+
+import dungeon_simulation as ds
+
+
+# Per-matchup values kept for every chunk
+FIELDS = ('attacker_win', 'defender_win', 'draw', 'rounds', 'attacker_hp', 'defender_hp')
+
+
+class SweepResults:
+
+    def __init__(self, fields, computed_chunks, cached_chunks):
+        self.attacker_win = fields['attacker_win']  # (players, enemies) probability the player wins
+        self.defender_win = fields['defender_win']  # (players, enemies) probability the enemy wins
+        self.draw = fields['draw']  # (players, enemies) probability the fight reaches max_rounds
+        self.rounds = fields['rounds']  # (players, enemies) mean fight length in rounds
+        self.attacker_hp = fields['attacker_hp']  # (players, enemies) mean player HP left after the fight
+        self.defender_hp = fields['defender_hp']  # (players, enemies) mean enemy HP left after the fight
+        self.computed_chunks = computed_chunks
+        self.cached_chunks = cached_chunks
+
+    def __str__(self):
+        return f"{self.attacker_win.size} matchups ({self.computed_chunks} chunks run, " \
+               f"{self.cached_chunks} from cache), player wins {self.attacker_win.mean():.1%} overall."
+
+
+def _chunk_key(player_stats, enemy_stats, fights, seed, max_rounds):
+    """
+    Identifies a chunk by everything that affects its results
+    :return: Hex digest used as cache file name and dice seed
+    """
+    digest = hashlib.sha256(f'{ds.RULES_VERSION}:{fights}:{seed}:{max_rounds}:'.encode())
+    digest.update(np.ascontiguousarray(player_stats, dtype=np.int16).tobytes())
+    digest.update(np.ascontiguousarray(enemy_stats, dtype=np.int16).tobytes())
+    return digest.hexdigest()
+
+
+def _run_chunk(player_stats, enemy_stats, fights, seed, max_rounds, key):
+    """
+    Simulates one chunk of matchups (runs inside a worker process)
+    :return: Dictionary of per-matchup arrays named by FIELDS
+    """
+    rng = np.random.default_rng(np.random.SeedSequence([seed, int(key[:16], 16)]))
+    p_mods, p_ac, p_hp = ds.combat_stats(player_stats)
+    e_mods, e_ac, e_hp = ds.combat_stats(enemy_stats)
+    results = ds.simulate_fights(p_mods, p_ac, p_hp, e_mods, e_ac, e_hp,
+                                 fights=fights, seed=rng, max_rounds=max_rounds)
+    return {'attacker_win': results.win_probability(ds.ATTACKER),
+            'defender_win': results.win_probability(ds.DEFENDER),
+            'draw': results.win_probability(ds.DRAW),
+            'rounds': results.rounds.mean(axis=1),
+            'attacker_hp': results.attacker_hp.mean(axis=1),
+            'defender_hp': results.defender_hp.mean(axis=1)}
+
+
+def _load_chunk(cache_dir, key):
+    path = os.path.join(cache_dir, key + '.npz')
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {name: data[name] for name in FIELDS}
+
+
+def _save_chunk(cache_dir, key, chunk):
+    # write then rename, so an interrupted sweep never leaves a partial cache file behind
+    path = os.path.join(cache_dir, key + '.npz')
+    temp_path = path + '.tmp.npz'
+    np.savez(temp_path, **chunk)
+    os.replace(temp_path, path)
+
+
+def run_sweep(player_stats, enemy_stats, fights=1000, seed=0, max_rounds=200,
+              workers=None, chunk_fights=1_000_000, cache_dir='.sweep_cache'):
+    """
+    Fights every player stat block against every enemy stat block, the player swinging first as in fight_loop
+    :param player_stats: Array of [STR, DEX, CON, INT, WIS, CHR] stat blocks (e.g. from ds.roll_stats),
+                         shape (players, 6)
+    :param enemy_stats: Array of enemy stat blocks, shape (enemies, 6)
+    :param fights: Number of fights simulated for each matchup
+    :param seed: Integer seed for the whole sweep
+    :param max_rounds: Rounds after which an unfinished fight counts as a draw
+    :param workers: Number of worker processes (defaults to all cores, 1 runs in this process)
+    :param chunk_fights: Approximate number of fights per chunk (the unit of work and of caching)
+    :param cache_dir: Directory holding finished chunks, or None to disable the cache
+    :return: SweepResults with (players, enemies) arrays
+    """
+    player_stats = np.atleast_2d(np.asarray(player_stats, dtype=np.int16))
+    enemy_stats = np.atleast_2d(np.asarray(enemy_stats, dtype=np.int16))
+    enemies = len(enemy_stats)
+    total = len(player_stats) * enemies
+    matchups_per_chunk = max(1, chunk_fights // fights)
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    fields = {name: np.empty(total) for name in FIELDS}
+    pending = []
+    cached_chunks = 0
+
+    # Matchups are numbered player-major; each chunk is a contiguous range of them
+    for start in range(0, total, matchups_per_chunk):
+        matchups = np.arange(start, min(start + matchups_per_chunk, total))
+        chunk_players = player_stats[matchups // enemies]
+        chunk_enemies = enemy_stats[matchups % enemies]
+        key = _chunk_key(chunk_players, chunk_enemies, fights, seed, max_rounds)
+
+        chunk = _load_chunk(cache_dir, key) if cache_dir is not None else None
+        if chunk is not None:
+            cached_chunks += 1
+            for name in FIELDS:
+                fields[name][matchups] = chunk[name]
+        else:
+            pending.append((matchups, chunk_players, chunk_enemies, key))
+
+    def store(matchups, key, chunk):
+        if cache_dir is not None:
+            _save_chunk(cache_dir, key, chunk)
+        for name in FIELDS:
+            fields[name][matchups] = chunk[name]
+
+    if workers == 1 or len(pending) <= 1:
+        for matchups, chunk_players, chunk_enemies, key in pending:
+            store(matchups, key, _run_chunk(chunk_players, chunk_enemies, fights, seed, max_rounds, key))
+
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_run_chunk, chunk_players, chunk_enemies, fights, seed, max_rounds, key):
+                       (matchups, key) for matchups, chunk_players, chunk_enemies, key in pending}
+            try:
+                for future in as_completed(futures):
+                    matchups, key = futures[future]
+                    store(matchups, key, future.result())
+            except BaseException:
+                executor.shutdown(cancel_futures=True)
+                raise
+
+    shape = (len(player_stats), enemies)
+    fields = {name: values.reshape(shape) for name, values in fields.items()}
+    return SweepResults(fields, len(pending), cached_chunks)
@@ -0,0 +1,176 @@
+"""
+Wandering enemies for "BeardedVagabond's Dungeon Crawler" (bv_dungeon_game.py)
+After every turn the player spends exploring (wall bumps included), each undefeated enemy steps through a random
+open door of its room, all enemies at once with NumPy over EntityStore location columns; like Player.move, a move
+needs a door on the current room that leads inside the maze
+wander: moves every active entity of a pair of location arrays one room, with one table lookup per entity
+WanderingEngine: GameEngine whose enemies live in an EntityStore and wander, starting a fight when one walks into
+the player's room; its SpatialIndex is only rebuilt when something asks for it after enemies moved, and it can be
+snapshotted and forked with dungeon_snapshot
+"""
+
+import functools
+import weakref
+
+import numpy as np
+
+import dungeon_classes as dc
+import dungeon_engine as de
+import dungeon_entities as dentities
+
+
+# A step is packed in 4 bits: the x step in the low 2 and the y step in the next 2, each as a 2-bit signed number
+STAY = 0
+
+_closed_cache = weakref.WeakKeyDictionary()
+
+
+@functools.lru_cache(maxsize=None)
+def _step_table():
+    """
+    Packed step for every door mask and random byte: the byte values are shared out between the open directions
+    of the room as evenly as 256 allows (a room with 3 doors favours one by 1/256), a closed room stays put
+    :return: uint8 array of shape (16 * 256,), indexed by mask << 8 | byte
+    """
+    table = np.zeros((16, 256), dtype=np.uint8)
+    for mask in range(1, 16):
+        steps = [(x_step & 3) | (y_step & 3) << 2
+                 for bit, (x_step, y_step) in zip((dc.NORTH, dc.EAST, dc.SOUTH, dc.WEST), dc.STEPS.values())
+                 if mask & bit]
+        table[mask] = [steps[byte * len(steps) >> 8] for byte in range(256)]
+    return table.ravel()
+
+
+def closed_masks(maze):
+    """
+    Door masks of a maze with every door leading out of it closed, so a step never needs a bounds check
+    (cached per MazeGrid; random and built-in mazes have no such doors and share their own masks)
+    :param maze: MazeGrid
+    :return: Flat uint8 array of door masks
+    """
+    masks = _closed_cache.get(maze)
+    if masks is None:
+        masks = maze.masks
+        if (masks[0] & dc.NORTH).any() or (masks[-1] & dc.SOUTH).any() or (masks[:, 0] & dc.WEST).any() or \
+                (masks[:, -1] & dc.EAST).any():
+            masks = masks.copy()
+            masks[0] &= ~dc.NORTH & 15
+            masks[-1] &= ~dc.SOUTH & 15
+            masks[:, 0] &= ~dc.WEST & 15
+            masks[:, -1] &= ~dc.EAST & 15
+        masks = _closed_cache[maze] = masks.ravel()
+    return masks
+
+
+def wander(maze, x_locations, y_locations, rng, active=None):
+    """
+    Moves entities one room each through a random open door of their room, in place
+    :param maze: MazeGrid
+    :param x_locations: int array of columns, updated in place
+    :param y_locations: int array of rows, updated in place
+    :param rng: numpy Generator
+    :param active: bool array of the entities that move (defaults to all)
+    :return: bool array of the entities that moved
+    """
+    # take is fastest with intp indexes
+    rooms = y_locations.astype(np.intp)
+    rooms *= maze.width
+    rooms += x_locations
+    steps = closed_masks(maze).take(rooms).astype(np.intp)
+    if active is not None:
+        steps *= active  # inactive entities act as if in a closed room
+    steps <<= 8
+    steps |= np.frombuffer(rng.bytes(len(steps)), dtype=np.uint8)
+    steps = _step_table().take(steps).view(np.int8)
+
+    # Sign-extend the 2-bit steps
+    x_locations += (steps << 6) >> 6
+    y_locations += (steps << 4) >> 6
+    return steps != STAY
+
+
+class WanderingEngine(de.GameEngine):
+
+    def __init__(self, maze, player, enemies, d20, d8, maze_choice=0):
+        """
+        Same arguments as GameEngine; the enemies are copied into an EntityStore and played through its views
+        :param maze: MazeGrid
+        """
+        self.store = dentities.EntityStore.from_combatants(enemies)  # enemy columns moved by wander
+        self.rng = d20.pool.generator  # enemies wander with the game's dice, so a seed still replays the game
+        super().__init__(maze, player, self.store.views(), d20, d8, maze_choice)
+
+    @classmethod
+    def new_game(cls, player_name, seed=None, enemy_count=3, maze_size=None, pool=None, maze_path=None):
+        """
+        Creates a new game like GameEngine.new_game with wandering enemies
+        :param maze_path: Not supported, wander steps through the door masks of a whole MazeGrid in memory
+        (other parameters as in GameEngine.new_game)
+        :return: WanderingEngine
+        """
+        if maze_path is not None:
+            raise ValueError('Wandering enemies need a built-in or random maze, not a maze file.')
+        return super().new_game(player_name, seed, enemy_count, maze_size, pool)
+
+    @property
+    def index(self):
+        # Rebuilt from the store's columns on first use after enemies wandered
+        if self._index_stale:
+            self._index.rebuild(self.store.x_location, self.store.y_location)
+            self._index_stale = False
+        return self._index
+
+    @index.setter
+    def index(self, index):
+        self._index = index
+        self._index_stale = False
+
+    def snapshot_extra(self):
+        # The store is rebuilt from the enemies and the wandering rng is the d20's pool, both already in a Snapshot
+        return b''
+
+    def restore_extra(self, extra):
+        pass
+
+    def wander(self):
+        """
+        Moves every undefeated enemy one room
+        :return: bool array of the enemies that moved
+        """
+        store = self.store
+        moved = wander(self.maze, store.x_location, store.y_location, self.rng, store.defeated == 0)
+        self._index_stale = True
+        return moved
+
+    def _explore(self, command, direction, events):
+        super()._explore(command, direction, events)
+        # Bumping into a wall or giving an unknown direction ends the player's turn before _check_encounter, but it
+        # still spends the turn, so the enemies move as after any other command
+        if events and events[0].kind in ('wall', 'unknown_direction'):
+            self.wander()
+            self._meet('ambush', events)
+
+    def _check_encounter(self, events):
+        # The player walked in on an enemy, so they fight before anyone moves
+        if self._meet('encounter', events):
+            return True
+        self.wander()
+        return self._meet('ambush', events)
+
+    def _meet(self, kind, events):
+        """
+        Starts a fight with the first undefeated enemy in the player's room, found from the store's columns
+        :param kind: Event kind to report, 'encounter' or 'ambush'
+        :param events: List of Events to add to
+        :return: True if a fight started
+        """
+        player, store = self.player, self.store
+        here = np.flatnonzero((store.x_location == player.x_location) & (store.y_location == player.y_location) &
+                              (store.defeated == 0))
+        if not here.size:
+            return False
+        enemy = self.enemies[here[0]]
+        events.append(de.Event(kind, player.name, enemy.name))
+        self.mode = de.FIGHT
+        self.fighter = enemy
+        return True